@@ -0,0 +1,231 @@
+"""Benchmarks for the ChoreSynCal pipeline: CSV load, scheduling and ICS serialization.
+
+Run from the repository root:
+
+    python benchmarks/bench_pipeline.py                      # full matrix, print results
+    python benchmarks/bench_pipeline.py --sizes 10 1000      # subset of chore counts
+    python benchmarks/bench_pipeline.py --compare            # fail on regressions vs baseline.json
+    python benchmarks/bench_pipeline.py --save               # rewrite baseline.json
+
+Needs Python 3.9+ (tracemalloc.reset_peak). Timings depend on the machine,
+so --compare is only meaningful against a baseline recorded on the same one
+(--baseline picks the file).
+
+Each scenario is timed REPEAT times, keeping each stage's fastest run
+(slower runs are other load on the machine, not the code), and run once
+more under tracemalloc for peak memory, so the allocation tracking does not
+distort the timings.
+Chore lists are synthetic but deterministic (fixed seed), and every
+scenario starts on the same date, so results are comparable across runs.
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csc_engine  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+START_DATE = datetime(2025, 1, 6)  # a Monday, so Month and Year periods are both long
+
+SIZES = [10, 1000, 10000, 100000]
+PERIODS = ['Month', 'Year']
+DAY_MODES = {
+    'both': (True, True),
+    'weekdays': (True, False),
+    'weekends': (False, True),
+}
+# (active_start, active_end, stagger_interval)
+WINDOWS = {
+    'wide-30': ('08:00', '18:00', '30'),
+    'narrow-15': ('10:00', '14:00', '15'),
+    'hour-0': ('09:00', '10:00', '0'),
+}
+STAGES = ['csv_load', 'scheduling', 'serialization']
+REPEAT = 3
+
+ROOMS = ['Kitchen', 'Bathroom', 'Bedroom', 'Loungeroom', 'Laundry', 'Hallway', 'Garage', 'Garden',
+         'Office', 'Dining', 'Ensuite', 'Study', 'Patio', 'Pantry', 'Nursery']
+VERBS = ['Wipe', 'Clean', 'Dust', 'Vacuum', 'Mop', 'Tidy', 'Sweep', 'Scrub', 'Empty', 'Organize']
+THINGS = ['surfaces', 'floor', 'windows', 'shelves', 'bins', 'handles', 'mirrors', 'skirting boards',
+          'light switches', 'cupboards']
+
+
+def make_chores_csv(path, count, seed=0):
+    """Write a deterministic synthetic chores CSV with roughly 40% daily, 35% weekly, 25% monthly rows."""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Frequency', 'Room', 'Task'])
+        for i in range(count):
+            frequency = rng.choices(['Daily', 'Weekly', 'Monthly'], weights=[40, 35, 25])[0]
+            writer.writerow([frequency, rng.choice(ROOMS), f"{rng.choice(VERBS)} {rng.choice(THINGS)} {i}"])
+
+
+class CountingSink:
+    """Binary stream that only counts bytes, so serialization is measured without buffering output."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+
+    def flush(self):
+        pass
+
+
+def scenario_settings(period, day_mode, window):
+    weekdays, weekends = DAY_MODES[day_mode]
+    active_start, active_end, stagger = WINDOWS[window]
+    return dict(csc_engine.DEFAULT_SETTINGS, period=period, schedule_weekdays=weekdays, schedule_weekends=weekends,
+                active_start=active_start, active_end=active_end, stagger_interval=stagger,
+                reminder_1hr=True, reminder_10min=True, reminder_1day=True)
+
+
+def run_stages(csv_path, settings):
+    """Run the pipeline once; return {stage: (seconds, items)} and, when tracing, {stage: peak bytes}."""
+    results = {}
+    peaks = {}
+
+    def measure(stage, func):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        value = func()
+        seconds = time.perf_counter() - started
+        if tracemalloc.is_tracing():
+            # Memory held from earlier stages (chores, events) is not charged to this one
+            peaks[stage] = tracemalloc.get_traced_memory()[1] - baseline
+        return value, seconds
+
+    chores, seconds = measure('csv_load', lambda: csc_engine.read_chores(csv_path))
+    results['csv_load'] = (seconds, len(chores))
+    events, seconds = measure('scheduling', lambda: list(csc_engine.schedule_chores(chores, settings, START_DATE)))
+    results['scheduling'] = (seconds, len(events))
+    writer, seconds = measure('serialization', lambda: csc_engine.write_calendar(events, CountingSink()))
+    results['serialization'] = (seconds, writer.events_written)
+    return results, peaks
+
+
+def run_scenario(csv_path, settings, repeat=REPEAT):
+    runs = [run_stages(csv_path, settings)[0] for _ in range(repeat)]
+    timings = {stage: min(run[stage] for run in runs) for stage in STAGES}
+    tracemalloc.start()
+    try:
+        _, peaks = run_stages(csv_path, settings)
+    finally:
+        tracemalloc.stop()
+    report = {}
+    for stage in STAGES:
+        seconds, items = timings[stage]
+        report[stage] = {
+            'seconds': round(seconds, 4),
+            'peak_kb': round(peaks[stage] / 1024, 1),
+            'items_per_sec': round(items / seconds) if seconds > 0 else None,
+            'items': items,
+        }
+    return report
+
+
+def run_matrix(sizes, repeat=REPEAT):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            csv_path = os.path.join(tmp, f"chores_{size}.csv")
+            make_chores_csv(csv_path, size)
+            for period, day_mode, window in itertools.product(PERIODS, DAY_MODES, WINDOWS):
+                name = f"{size}/{period}/{day_mode}/{window}"
+                report = run_scenario(csv_path, scenario_settings(period, day_mode, window), repeat)
+                results[name] = report
+                print(format_row(name, report), flush=True)
+    return results
+
+
+def format_row(name, report):
+    cells = []
+    for stage in STAGES:
+        r = report[stage]
+        rate = f"{r['items_per_sec']:>9,}/s" if r['items_per_sec'] is not None else f"{'-':>11}"
+        cells.append(f"{r['seconds'] * 1000:9.1f}ms {r['peak_kb']:9.0f}KB {rate}")
+    return f"{name:<34} " + ' | '.join(cells)
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions beyond tolerance (fractional slowdown or growth).
+
+    A stage that now handles a different number of items (the schedule
+    itself changed) is reported as such rather than timed against work it
+    no longer does.
+    """
+    regressions = []
+    for name, report in results.items():
+        if name not in baseline:
+            continue
+        for stage in STAGES:
+            old, new = baseline[name][stage], report[stage]
+            if old['items'] != new['items']:
+                regressions.append(f"{name} {stage}: {old['items']} -> {new['items']} items, baseline is out of date")
+                continue
+            # Ignore timing noise on stages that take under a few milliseconds
+            if old['seconds'] >= 0.005 and new['seconds'] > old['seconds'] * (1 + tolerance):
+                regressions.append(f"{name} {stage}: {old['seconds']:.4f}s -> {new['seconds']:.4f}s")
+            if old['peak_kb'] >= 64 and new['peak_kb'] > old['peak_kb'] * (1 + tolerance):
+                regressions.append(f"{name} {stage}: peak {old['peak_kb']:.0f}KB -> {new['peak_kb']:.0f}KB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ChoreSynCal scheduling and serialization pipeline")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="chore counts to run (default: 10 1000 10000 100000)")
+    parser.add_argument('--save', action='store_true', help="write results to baseline.json")
+    parser.add_argument('--compare', action='store_true', help="compare against baseline.json and fail on regressions")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help=f"timed runs per scenario, fastest kept (default: {REPEAT})")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown or memory growth (default: 0.25)")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline file (default: benchmarks/baseline.json)")
+    args = parser.parse_args(argv)
+
+    # Capacity warnings for chores that do not fit the period would swamp the output
+    logging.disable(logging.WARNING)
+    print(f"{'scenario':<34} " + ' | '.join(f"{stage:^32}" for stage in STAGES))
+    results = run_matrix(args.sizes, max(args.repeat, 1))
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    if args.compare:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head): stop quietly, and keep the interpreter's
+        # final flush of stdout from raising again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
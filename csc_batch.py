@@ -0,0 +1,139 @@
+"""Batch generation of many household calendars over a process pool.
+
+A batch source is either a JSON manifest:
+
+    [{"name": "smiths", "csv": "smiths.csv", "settings": "smiths.json"}, ...]
+
+(paths relative to the manifest; "settings" and "output" are optional, and
+"caldav" names a CalDAV collection to publish the household to), or a
+directory of chores CSVs where each `name.csv` is paired with an optional
+`name.json` settings profile. Each household gets its own ICS file and one
+bad CSV only fails its own job; skipped rows are reported in `name.errors.csv`
+next to the ICS file.
+"""
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import csc_caldav
+import csc_engine
+from csc_ics import read_previous_events
+from csc_metrics import RunMetrics, profile_run
+
+BatchJob = namedtuple('BatchJob', ['name', 'csv_file', 'settings_file', 'output_file', 'caldav_url'])
+# events counts the household's scheduled events; written those rendered anew (the rest were copied unchanged with --incremental)
+BatchResult = namedtuple('BatchResult', ['name', 'ok', 'message', 'events', 'written', 'seconds'])
+
+
+def load_jobs(source, output_dir):
+    if os.path.isdir(source):
+        return jobs_from_directory(source, output_dir)
+    return jobs_from_manifest(source, output_dir)
+
+
+def jobs_from_directory(directory, output_dir):
+    jobs = []
+    for entry in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(entry)
+        if ext.lower() != '.csv':
+            continue
+        settings_file = os.path.join(directory, name + '.json')
+        jobs.append(BatchJob(name, os.path.join(directory, entry),
+                             settings_file if os.path.exists(settings_file) else None,
+                             os.path.join(output_dir, name + '.ics'), None))
+    return jobs
+
+
+def jobs_from_manifest(manifest_file, output_dir):
+    base = os.path.dirname(os.path.abspath(manifest_file))
+    with open(manifest_file, 'r') as f:
+        entries = json.load(f)
+    jobs = []
+    for entry in entries:
+        name = entry['name']
+        settings_file = entry.get('settings')
+        output_file = entry.get('output') or os.path.join(output_dir, name + '.ics')
+        jobs.append(BatchJob(name, os.path.join(base, entry['csv']),
+                             os.path.join(base, settings_file) if settings_file else None,
+                             os.path.join(base, output_file) if entry.get('output') else output_file,
+                             entry.get('caldav')))
+    return jobs
+
+
+def generate_household(job, today=None, incremental=False, profile=None, profile_dir='.'):
+    """Generate one household's calendar; never raises, so one bad job cannot stop the batch."""
+    started = time.perf_counter()
+    temp_file = job.output_file + '.tmp'
+    metrics = RunMetrics(run=job.name)
+    try:
+        with profile_run(profile, profile_dir, run=job.name):
+            with metrics.stage('settings_load'):
+                settings = csc_engine.load_settings(job.settings_file) if job.settings_file else dict(csc_engine.DEFAULT_SETTINGS)
+                # Households sharing a chore list still get distinct UIDs
+                settings.setdefault('calendar_id', job.name)
+                compiled = csc_engine.compile_settings(settings, today)
+            with metrics.stage('csv_read') as stage:
+                chores = csc_engine.read_chores(job.csv_file)
+                stage.count = len(chores)
+            if chores.errors:
+                csc_engine.write_error_report(chores.errors, os.path.splitext(job.output_file)[0] + '.errors.csv')
+            events = schedule = csc_engine.schedule_chores(chores, compiled, metrics=metrics)
+            if job.caldav_url:
+                # Written and published, so scheduled once up front
+                events = list(events)
+            previous = None
+            if incremental and os.path.exists(job.output_file):
+                with metrics.stage('previous_read') as stage:
+                    with open(job.output_file, 'rb') as f:
+                        previous = read_previous_events(f)
+                    stage.count = len(previous)
+            # Write next to the target and rename, so readers never see a half-written calendar
+            with open(temp_file, 'wb') as f:
+                writer = csc_engine.write_calendar(events, f, previous, metrics, zone=compiled.zone)
+            os.replace(temp_file, job.output_file)
+            if job.caldav_url:
+                # Each household keeps its own publish state, so workers never share a file
+                publisher = csc_caldav.CalDAVPublisher(job.caldav_url, password=os.environ.get(csc_caldav.PASSWORD_ENV),
+                                                       state_file=os.path.splitext(job.output_file)[0] + '.publish.json')
+                with metrics.stage('publish') as stage:
+                    stage.count = publisher.publish(events, compiled.zone).requests
+        metrics.log()
+        logging.info(f"ICS file generated: {job.output_file}")
+        events = writer.events_written + writer.events_unchanged
+        if schedule.dropped:
+            # The calendar is still written, but it is missing chores
+            return BatchResult(job.name, False, f"{job.output_file}: {csc_engine.format_dropped(schedule.dropped)}",
+                               events, writer.events_written, time.perf_counter() - started)
+        return BatchResult(job.name, True, job.output_file, events, writer.events_written, time.perf_counter() - started)
+    except Exception as e:
+        logging.error(f"Batch job {job.name} failed: {str(e)}")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        return BatchResult(job.name, False, str(e), 0, 0, time.perf_counter() - started)
+
+
+def _init_worker(log_file):
+    logging.basicConfig(
+        filename=log_file,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+
+def run_batch(jobs, workers=None, today=None, log_file='csc.log', incremental=False, profile=None, profile_dir='.'):
+    """Run jobs over a process pool and yield a BatchResult per job, in job order."""
+    if not jobs:
+        return
+    for job in jobs:
+        os.makedirs(os.path.dirname(os.path.abspath(job.output_file)), exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_file,)) as pool:
+        futures = [pool.submit(generate_household, job, today, incremental, profile, profile_dir) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker process itself died
+                yield BatchResult(job.name, False, str(e), 0, 0, 0.0)
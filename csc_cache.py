@@ -0,0 +1,245 @@
+"""On-disk cache of expanded calendar occurrences, for previews and queries.
+
+A generated calendar's occurrences (every RRULE expanded over the period)
+are stored in a SQLite file, keyed by a hash of the chore CSV, the settings
+and the period start, so asking "what happens in March?" again reads an
+indexed range instead of re-running the scheduler or parsing an ICS file:
+
+    cache = OccurrenceCache()
+    calendar_id = cached_calendar(cache, 'chores.csv', settings)
+    for row in cache.query(calendar_id, datetime(2025, 3, 1), datetime(2025, 4, 1)):
+        ...
+
+Entries unused for max_age_days are dropped, and the least recently used
+ones go first once the estimated size passes max_bytes.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import csc_conflicts
+import csc_engine
+import csc_members
+import csc_timezone
+import csc_vectorized
+from csc_conflicts import from_minutes, occurrence_keys, to_minutes
+from csc_metrics import RunMetrics
+
+CACHE_FILE = 'csc_cache.sqlite'
+# Bump when the tables change; scheduling changes are covered by engine_fingerprint
+CACHE_VERSION = 1
+# Every module whose code decides which occurrences a calendar has
+ENGINE_MODULES = (csc_engine, csc_members, csc_vectorized, csc_timezone, csc_conflicts)
+# Rough on-disk cost of a row, used for the size budget
+OCCURRENCE_BYTES = 24
+EVENT_BYTES = 160
+
+CachedOccurrence = namedtuple('CachedOccurrence', ['start', 'end', 'summary', 'frequency', 'uid'])
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS calendars (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    period_start INTEGER NOT NULL,
+    period_end INTEGER NOT NULL,
+    events INTEGER NOT NULL,
+    occurrences INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    PRIMARY KEY (calendar_id, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS occurrences (
+    calendar_id INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    PRIMARY KEY (calendar_id, start, idx)
+) WITHOUT ROWID;
+'''
+
+
+@functools.lru_cache(maxsize=None)
+def engine_fingerprint():
+    """Hash of the scheduling code itself, so entries made by any other version of it are never served."""
+    digest = hashlib.sha256()
+    for module in ENGINE_MODULES:
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def calendar_key(csv_path, settings, start_date):
+    """Content hash of everything a calendar's occurrences depend on.
+
+    The CSV is hashed by content (not path or mtime) in chunks; settings are
+    hashed as canonical JSON without csv_file, so moving a file keeps its
+    entry. The engine's own code is part of the key too (engine_fingerprint).
+    """
+    digest = hashlib.sha256(f"v{CACHE_VERSION}\x1f{engine_fingerprint()}\x1f{start_date:%Y-%m-%d}\x1f".encode('utf-8'))
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    relevant = {k: v for k, v in settings.items() if k != 'csv_file'}
+    digest.update(json.dumps(relevant, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class OccurrenceCache:
+    """SQLite store of expanded occurrences, one entry per calendar key.
+
+    Occurrences are (calendar, start minute, event index) rows clustered on
+    start time, so a date range is one index seek; the event fields shared
+    by all of a series' occurrences are stored once per event.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_age_days=30, max_bytes=256 << 20):
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_bytes
+        new_file = not os.path.exists(path)
+        self.db = sqlite3.connect(path)
+        if new_file:
+            # Lets evict() hand freed pages back to the filesystem
+            self.db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def lookup(self, key):
+        """Return the calendar id cached under key (marking it used), or None."""
+        row = self.db.execute('SELECT id FROM calendars WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self.db:
+            self.db.execute('UPDATE calendars SET last_used = ? WHERE id = ?', (time.time(), row[0]))
+        return row[0]
+
+    def store(self, key, events, period_start, period_end):
+        """Expand events into occurrences and cache them under key; returns the calendar id."""
+        events = list(events)
+        count = len(events)
+        now = time.time()
+        occurrences = 0
+
+        def rows(calendar_id):
+            # Occurrences stream straight from the expansion into SQLite, counted on the way
+            nonlocal occurrences
+            for occurrence_key in occurrence_keys(events):
+                occurrences += 1
+                yield (calendar_id,) + divmod(occurrence_key, count)
+
+        with self.db:
+            # A stale entry under the same key goes with its event and occurrence rows
+            old = self.db.execute('SELECT id FROM calendars WHERE key = ?', (key,)).fetchone()
+            if old is not None:
+                self.remove(old[0])
+            calendar_id = self.db.execute(
+                'INSERT INTO calendars (key, period_start, period_end, events, occurrences, size, created, last_used) '
+                'VALUES (?, ?, ?, ?, 0, 0, ?, ?)',
+                (key, to_minutes(period_start), to_minutes(period_end), count, now, now)).lastrowid
+            self.db.executemany(
+                'INSERT INTO events (calendar_id, idx, summary, frequency, uid, duration) VALUES (?, ?, ?, ?, ?, ?)',
+                ((calendar_id, index, event.summary, event.frequency, event.uid,
+                  int((event.end - event.start).total_seconds() // 60)) for index, event in enumerate(events)))
+            # Keys come in (start, index) order, which is also the primary key order
+            self.db.executemany('INSERT INTO occurrences (calendar_id, start, idx) VALUES (?, ?, ?)', rows(calendar_id))
+            self.db.execute('UPDATE calendars SET occurrences = ?, size = ? WHERE id = ?',
+                            (occurrences, occurrences * OCCURRENCE_BYTES + count * EVENT_BYTES, calendar_id))
+        logging.info(f"Cached {occurrences} occurrences of {count} events in {self.path}")
+        # The caller is about to read the new entry, so it stays even if it alone is over max_bytes
+        self.evict(keep=calendar_id)
+        return calendar_id
+
+    def period(self, calendar_id):
+        """(period start, period end) of a cached calendar."""
+        start, end = self.db.execute('SELECT period_start, period_end FROM calendars WHERE id = ?',
+                                     (calendar_id,)).fetchone()
+        return from_minutes(start), from_minutes(end)
+
+    def query(self, calendar_id, start=None, end=None):
+        """Yield CachedOccurrences starting in [start, end) (either bound optional), in time order."""
+        low = to_minutes(start) if start is not None else 0
+        high = to_minutes(end) if end is not None else 1 << 62
+        rows = self.db.execute(
+            'SELECT o.start, e.duration, e.summary, e.frequency, e.uid FROM occurrences o '
+            'JOIN events e ON e.calendar_id = o.calendar_id AND e.idx = o.idx '
+            'WHERE o.calendar_id = ? AND o.start >= ? AND o.start < ? ORDER BY o.start, o.idx',
+            (calendar_id, low, high))
+        for minute, duration, summary, frequency, uid in rows:
+            occurrence_start = from_minutes(minute)
+            yield CachedOccurrence(occurrence_start, occurrence_start + timedelta(minutes=duration), summary, frequency, uid)
+
+    def count_by_day(self, calendar_id, start=None, end=None):
+        """Map each day (a datetime at midnight) to its number of occurrences in [start, end)."""
+        low = to_minutes(start) if start is not None else 0
+        high = to_minutes(end) if end is not None else 1 << 62
+        rows = self.db.execute(
+            'SELECT start / 1440, COUNT(*) FROM occurrences WHERE calendar_id = ? AND start >= ? AND start < ? '
+            'GROUP BY start / 1440', (calendar_id, low, high))
+        return {from_minutes(day * 1440): count for day, count in rows}
+
+    def remove(self, calendar_id):
+        self.db.execute('DELETE FROM occurrences WHERE calendar_id = ?', (calendar_id,))
+        self.db.execute('DELETE FROM events WHERE calendar_id = ?', (calendar_id,))
+        self.db.execute('DELETE FROM calendars WHERE id = ?', (calendar_id,))
+
+    def evict(self, keep=None):
+        """Drop entries older than max_age, then least recently used ones until under max_bytes.
+
+        keep is a calendar id that is never dropped.
+        """
+        removed = 0
+        with self.db:
+            for (calendar_id,) in self.db.execute('SELECT id FROM calendars WHERE last_used < ?',
+                                                  (time.time() - self.max_age,)).fetchall():
+                if calendar_id == keep:
+                    continue
+                self.remove(calendar_id)
+                removed += 1
+            total = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM calendars').fetchone()[0]
+            for calendar_id, size in self.db.execute('SELECT id, size FROM calendars ORDER BY last_used').fetchall():
+                if total <= self.max_bytes:
+                    break
+                if calendar_id == keep:
+                    continue
+                self.remove(calendar_id)
+                total -= size
+                removed += 1
+        if removed:
+            self.db.execute('PRAGMA incremental_vacuum')
+            logging.info(f"Evicted {removed} cached calendars from {self.path}")
+        return removed
+
+
+def cached_calendar(cache, csv_path, settings, today=None, metrics=None):
+    """Return the cache id of the calendar for this CSV and settings, scheduling and storing it on a miss."""
+    metrics = metrics or RunMetrics()
+    compiled = csc_engine.compile_settings(settings, today)
+    key = calendar_key(csv_path, settings, compiled.start_date)
+    calendar_id = cache.lookup(key)
+    if calendar_id is not None:
+        logging.info(f"Occurrence cache hit for {csv_path}")
+        return calendar_id
+    with metrics.stage('csv_read') as stage:
+        chores = csc_engine.read_chores(csv_path)
+        stage.count = len(chores)
+    events = list(csc_engine.schedule_chores(chores, compiled, metrics=metrics))
+    with metrics.stage('occurrence_cache') as stage:
+        calendar_id = cache.store(key, events, compiled.start_date, compiled.end_date)
+        stage.count = len(events)
+    return calendar_id
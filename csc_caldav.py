@@ -0,0 +1,248 @@
+"""Publish scheduled events to a CalDAV collection, sending only changes.
+
+Each event becomes its own calendar object resource, `<collection>/<UID>.ics`.
+A small state file remembers, per collection, the content hash and ETag of
+every event last published, so a re-publish only PUTs new or changed events
+(If-Match on the stored ETag, If-None-Match: * for new ones) and DELETEs
+events that are no longer generated; unchanged events cost no request at
+all. Without a state file the collection is listed once with PROPFIND.
+
+Requests go over a fixed set of keep-alive connections, one per worker
+thread, so at most `concurrency` requests are in flight:
+
+    publisher = CalDAVPublisher('https://dav.example.com/cal/smiths/', username='smiths', password=...)
+    result = publisher.publish(events)
+"""
+import base64
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+from csc_engine import ChoreSynCalError
+from csc_ics import ICSWriter
+from csc_timezone import utc_now
+
+STATE_FILE = 'csc_publish_state.json'
+PASSWORD_ENV = 'CSC_CALDAV_PASSWORD'
+DEFAULT_CONCURRENCY = 4
+TIMEOUT_SECONDS = 30
+
+PublishResult = namedtuple('PublishResult', ['created', 'updated', 'deleted', 'unchanged', 'requests'])
+
+PROPFIND_BODY = (b'<?xml version="1.0" encoding="utf-8"?>'
+                 b'<d:propfind xmlns:d="DAV:"><d:prop><d:getetag/></d:prop></d:propfind>')
+
+
+class PublishError(ChoreSynCalError):
+    pass
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def event_body(writer, scheduled, dtstamp):
+    """A one-event VCALENDAR for scheduled, as bytes (with the writer's VTIMEZONE, if it has a zone)."""
+    return writer.render_header() + writer.render_event(scheduled, scheduled.uid, dtstamp) + b'END:VCALENDAR\r\n'
+
+
+def load_state(path, url):
+    """{UID: [content hash, ETag]} last published to url, or None if it never was."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f).get(url)
+
+
+def save_state(path, url, state):
+    states = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            states = json.load(f)
+    states[url] = state
+    # Write next to the target and rename, so a crash never leaves a truncated state file
+    with open(path + '.tmp', 'w') as f:
+        json.dump(states, f)
+    os.replace(path + '.tmp', path)
+
+
+class CalDAVPublisher:
+    """Push events to one CalDAV collection over pooled keep-alive connections.
+
+    connect, if given, replaces http.client's connection classes: it is
+    called as connect(scheme, host, port) and must return an object with
+    the HTTPConnection request/getresponse/close interface, which lets the
+    publisher run against an in-process fake server.
+    """
+
+    def __init__(self, url, username=None, password=None, concurrency=DEFAULT_CONCURRENCY,
+                 state_file=STATE_FILE, connect=None):
+        address = urlparse(url)
+        if address.scheme not in ('http', 'https'):
+            raise PublishError(f"CalDAV URL must start with http:// or https://: {url}")
+        self.scheme = address.scheme
+        self.host = address.hostname
+        self.port = address.port
+        self.path = address.path.rstrip('/') + '/'
+        # The state is keyed without credentials, so a changed password keeps it
+        self.url = f"{self.scheme}://{address.netloc.rpartition('@')[2]}{self.path}"
+        username = username or (unquote(address.username) if address.username else None)
+        password = password or (unquote(address.password) if address.password else None)
+        self.headers = {}
+        if username:
+            token = base64.b64encode(f"{username}:{password or ''}".encode('utf-8')).decode('ascii')
+            self.headers['Authorization'] = f"Basic {token}"
+        self.concurrency = max(1, concurrency)
+        self.state_file = state_file
+        self.connect = connect or self._connect
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def _connect(self, scheme, host, port):
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=TIMEOUT_SECONDS)
+        return http.client.HTTPConnection(host, port, timeout=TIMEOUT_SECONDS)
+
+    def connection(self):
+        """This thread's keep-alive connection, opened on first use."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = self.connect(self.scheme, self.host, self.port)
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+
+    def request(self, method, path, body=None, headers=None):
+        """Send one request on this thread's connection; returns (status, response, body).
+
+        A dropped keep-alive connection is reopened and the request sent once more.
+        """
+        headers = {**self.headers, **(headers or {})}
+        for attempt in (1, 2):
+            connection = self.connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                with self.lock:
+                    self.requests += 1
+                return response.status, response, data
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                self.local.connection = None
+                if attempt == 2:
+                    raise PublishError(f"{method} {path} failed: {e}")
+
+    def resource_path(self, uid):
+        return f"{self.path}{uid}.ics"
+
+    def list_collection(self):
+        """{UID: ETag} of the .ics resources already in the collection (one PROPFIND)."""
+        status, _, data = self.request('PROPFIND', self.path, PROPFIND_BODY,
+                                       {'Depth': '1', 'Content-Type': 'application/xml; charset=utf-8'})
+        if status == 404:
+            return {}
+        if status != 207:
+            raise PublishError(f"PROPFIND {self.path} returned HTTP {status}")
+        existing = {}
+        for response in ET.fromstring(data).iter('{DAV:}response'):
+            href = unquote(response.findtext('{DAV:}href', ''))
+            name = href.rstrip('/').rpartition('/')[2]
+            if name.endswith('.ics'):
+                existing[name[:-len('.ics')]] = response.findtext('.//{DAV:}getetag') or ''
+        return existing
+
+    def put(self, uid, body, etag):
+        """PUT one event; etag None means it should not exist yet. Returns the new ETag (or '')."""
+        headers = {'Content-Type': 'text/calendar; charset=utf-8'}
+        if etag:
+            headers['If-Match'] = etag
+        elif etag is None:
+            headers['If-None-Match'] = '*'
+        status, response, _ = self.request('PUT', self.resource_path(uid), body, headers)
+        if status == 412:
+            # Changed or created behind our back; the generated calendar wins
+            logging.warning(f"CalDAV event {uid} changed on the server, overwriting")
+            del headers['If-Match' if etag else 'If-None-Match']
+            status, response, _ = self.request('PUT', self.resource_path(uid), body, headers)
+        if status not in (200, 201, 204):
+            raise PublishError(f"PUT {self.resource_path(uid)} returned HTTP {status}")
+        return response.getheader('ETag') or ''
+
+    def delete(self, uid, etag):
+        headers = {'If-Match': etag} if etag else {}
+        status, _, _ = self.request('DELETE', self.resource_path(uid), headers=headers)
+        if status == 412:
+            logging.warning(f"CalDAV event {uid} changed on the server, deleting anyway")
+            status, _, _ = self.request('DELETE', self.resource_path(uid))
+        # Already gone is as good as deleted
+        if status not in (200, 204, 404):
+            raise PublishError(f"DELETE {self.resource_path(uid)} returned HTTP {status}")
+
+    def publish(self, events, zone=None):
+        """Bring the collection in line with events; returns a PublishResult.
+
+        Only events whose content changed since the last publish are sent,
+        so the request count follows the number of changes, not the
+        calendar size. zone (CompiledSettings.zone) is the time zone event
+        times are written in, as for csc_engine.write_calendar.
+        """
+        writer = ICSWriter(None, zone)
+        state = load_state(self.state_file, self.url)
+        if state is None:
+            # First publish here: anything already in the collection has an unknown hash
+            state = {uid: ['', etag] for uid, etag in self.list_collection().items()}
+        dtstamp = utc_now()
+        changes = []  # (uid, body, hash, stored ETag or None)
+        generated = set()
+        unchanged = 0
+        for scheduled in events:
+            generated.add(scheduled.uid)
+            # Hashed without DTSTAMP, which changes on every run
+            digest = content_hash(writer.render_event(scheduled, scheduled.uid, ''))
+            stored = state.get(scheduled.uid)
+            if stored is not None and stored[0] == digest:
+                unchanged += 1
+                continue
+            changes.append((scheduled.uid, event_body(writer, scheduled, dtstamp), digest,
+                            None if stored is None else stored[1]))
+        removed = [uid for uid in state if uid not in generated]
+
+        def send(change):
+            uid, body, digest, etag = change
+            return uid, [digest, self.put(uid, body, etag)]
+
+        def remove(uid):
+            self.delete(uid, state[uid][1])
+            return uid
+
+        created = sum(1 for change in changes if change[3] is None)
+        try:
+            # The pool's worker count bounds the requests in flight
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for uid, entry in pool.map(send, changes):
+                    state[uid] = entry
+                for uid in pool.map(remove, removed):
+                    del state[uid]
+        finally:
+            # Whatever did get through is remembered, so a retry resumes where this run stopped
+            save_state(self.state_file, self.url, state)
+            self.close()
+        result = PublishResult(created, len(changes) - created, len(removed), unchanged, self.requests)
+        logging.info(f"Published to {self.url}: {result.created} created, {result.updated} updated, "
+                     f"{result.deleted} deleted, {result.unchanged} unchanged in {result.requests} requests")
+        return result
@@ -0,0 +1,342 @@
+"""Command line entry point for ChoreSynCal.
+
+Usage:
+    python csc_cli.py generate --csv chores.csv --settings csc_settings.json -o out.ics
+
+This module never imports tkinter, so it runs on machines without a display.
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+import csc_batch
+import csc_cache
+import csc_caldav
+import csc_compare
+import csc_conflicts
+import csc_engine
+import csc_members
+import csc_server
+import csc_watch
+from csc_ics import open_output, read_previous_events
+from csc_metrics import PROFILERS, RunMetrics, profile_run
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+
+def cmd_generate(args):
+    metrics = RunMetrics(run=args.output)
+    with profile_run(args.profile, args.profile_dir, run='generate'):
+        with metrics.stage('settings_load'):
+            settings = csc_engine.load_settings(args.settings)
+            compiled = csc_engine.compile_settings(settings, args.start)
+        csv_file = args.csv or settings['csv_file']
+        with metrics.stage('csv_read') as stage:
+            chores = csc_engine.read_chores(csv_file)
+            stage.count = len(chores)
+        if chores.errors:
+            print(f"Skipped {len(chores.errors)} invalid rows in {csv_file}:\n{csc_engine.format_row_errors(chores.errors)}",
+                  file=sys.stderr)
+            if args.error_report:
+                csc_engine.write_error_report(chores.errors, args.error_report)
+        events = schedule = csc_engine.schedule_chores(chores, compiled, metrics=metrics)
+        if args.conflicts:
+            events = check_conflicts(events, compiled, args.conflicts, metrics, schedule.layout)
+        if args.per_member:
+            events = list(events)
+            write_member_calendars(events, args.per_member, metrics, compiled.zone, summary=args.output != '-')
+        previous = None
+        if args.previous:
+            # Read fully before opening the output, which may be the same file
+            with metrics.stage('previous_read') as stage:
+                with open(args.previous, 'rb') as f:
+                    previous = read_previous_events(f)
+                stage.count = len(previous)
+        stream, close = open_output(args.output)
+        try:
+            writer = csc_engine.write_calendar(events, stream, previous, metrics=metrics, zone=compiled.zone)
+        finally:
+            close()
+    metrics.log()
+    logging.info(f"ICS file generated: {args.output} ({writer.events_written} events written, "
+                 f"{writer.events_unchanged} unchanged, {writer.bytes_written} bytes)")
+    if args.output != '-':
+        print(f"ICS file generated: {args.output}")
+        if previous is not None:
+            print(f"{writer.events_written} events changed or new, {writer.events_unchanged} unchanged")
+    return report_dropped(schedule)
+
+
+def report_dropped(schedule):
+    """Report chores the schedule left out on stderr; returns the exit status (1 if any were)."""
+    if not schedule.dropped:
+        return 0
+    print(csc_engine.format_dropped(schedule.dropped), file=sys.stderr)
+    return 1
+
+
+def write_member_calendars(events, directory, metrics, zone=None, summary=True):
+    """Write one <member>.ics per assigned member (each with the shared re-import reminder) into directory.
+
+    summary prints how many were written and the busiest day; it is off when the calendar goes to stdout.
+    """
+    calendars = csc_members.split_by_member(events)
+    if not calendars:
+        print("No chores are assigned to members; set 'members' in the settings or add an Assignee column",
+              file=sys.stderr)
+        return
+    os.makedirs(directory, exist_ok=True)
+    with metrics.stage('member_calendars') as stage:
+        for name, member_events in calendars.items():
+            with open(os.path.join(directory, csc_members.member_filename(name)), 'wb') as f:
+                csc_engine.write_calendar(member_events, f, zone=zone)
+        stage.count = len(calendars)
+    if not summary:
+        return
+    peaks = csc_members.peak_loads(events)
+    busiest = max(peaks.items(), key=lambda item: item[1][1])
+    print(f"{len(calendars)} member calendars written to {directory}; busiest day: {busiest[0]}, "
+          f"{busiest[1][1]} minutes on {busiest[1][0]:%Y-%m-%d}")
+
+
+def check_conflicts(events, compiled, mode, metrics, layout=None):
+    """Expand every occurrence and report conflicts on stderr; with mode 'resolve', return the resolved events.
+
+    layout is the Schedule's csc_engine.SlotLayout.
+    """
+    with metrics.stage('conflict_check') as stage:
+        events = list(events)
+        if mode == 'resolve':
+            resolved, conflicts = csc_conflicts.resolve_conflicts(events, compiled, layout)
+        else:
+            resolved, conflicts = events, csc_conflicts.find_conflicts(events, compiled, layout=layout)
+        stage.count = len(conflicts)
+    counts = csc_conflicts.summarize_conflicts(conflicts)
+    logging.info(f"Conflicts: {counts}")
+    if conflicts:
+        print("Conflicts: " + ', '.join(f"{count} {kind.replace('_', ' ')}" for kind, count in counts.items()),
+              file=sys.stderr)
+        for conflict in conflicts[:10]:
+            occurrence = conflict.occurrence
+            print(f"  {conflict.kind}: {occurrence.start:%Y-%m-%d %H:%M} {events[occurrence.index].summary}", file=sys.stderr)
+        if len(conflicts) > 10:
+            print(f"  ... and {len(conflicts) - 10} more", file=sys.stderr)
+        if mode == 'resolve':
+            # One-off events are moved in place; a series' moved occurrences become added one-off events
+            moved = sum(1 for old, new in zip(events, resolved) if new.start != old.start) + len(resolved) - len(events)
+            print(f"Moved {moved} occurrences to free slots", file=sys.stderr)
+    return resolved
+
+
+def cmd_batch(args):
+    jobs = csc_batch.load_jobs(args.source, args.output_dir)
+    if not jobs:
+        print(f"No households found in {args.source}", file=sys.stderr)
+        return 1
+    failures = 0
+    for result in csc_batch.run_batch(jobs, workers=args.workers, today=args.start, log_file=args.log,
+                                      incremental=args.incremental, profile=args.profile,
+                                      profile_dir=args.profile_dir):
+        if result.ok:
+            changed = f" ({result.written} changed or new)" if args.incremental else ''
+            print(f"OK      {result.name}: {result.events} events{changed} in {result.seconds:.2f}s -> {result.message}")
+        else:
+            failures += 1
+            print(f"FAILED  {result.name}: {result.message}")
+    print(f"{len(jobs) - failures} succeeded, {failures} failed")
+    return 1 if failures else 0
+
+
+def cmd_compare(args):
+    diff = csc_compare.compare_files(args.old, args.new)
+    for line in csc_compare.format_diff(diff, args.limit):
+        print(line)
+    return 1 if diff.added or diff.removed or diff.moved else 0
+
+
+def cmd_watch(args):
+    watcher = csc_watch.Watcher(args.source, args.output_dir, args.settings, args.output, args.debounce, args.start)
+    print(f"Watching {args.source} (Ctrl+C to stop)")
+
+    def report(name, result):
+        if isinstance(result, str):
+            print(f"FAILED  {name}: {result}")
+        else:
+            print(f"OK      {name}: rescheduled {', '.join(result) or 'only the re-import reminder'}")
+    watcher.run(args.interval, report)
+    return 0
+
+
+def cmd_serve(args):
+    jobs = csc_batch.load_jobs(args.source, '.')
+    if not jobs:
+        print(f"No households found in {args.source}", file=sys.stderr)
+        return 1
+    print(f"Serving {len(jobs)} calendars on {args.host}:{args.port} "
+          f"(e.g. webcal://{args.host}:{args.port}/{jobs[0].name}.ics, Ctrl+C to stop)")
+    csc_server.run_server(jobs, args.host, args.port, args.cache_mb << 20)
+    return 0
+
+
+def cmd_publish(args):
+    metrics = RunMetrics(run=args.url)
+    with profile_run(args.profile, args.profile_dir, run='publish'):
+        with metrics.stage('settings_load'):
+            settings = csc_engine.load_settings(args.settings)
+            compiled = csc_engine.compile_settings(settings, args.start)
+        csv_file = args.csv or settings['csv_file']
+        with metrics.stage('csv_read') as stage:
+            chores = csc_engine.read_chores(csv_file)
+            stage.count = len(chores)
+        if chores.errors:
+            print(f"Skipped {len(chores.errors)} invalid rows in {csv_file}:\n{csc_engine.format_row_errors(chores.errors)}",
+                  file=sys.stderr)
+        schedule = csc_engine.schedule_chores(chores, compiled, metrics=metrics)
+        publisher = csc_caldav.CalDAVPublisher(args.url, username=args.user,
+                                               password=os.environ.get(csc_caldav.PASSWORD_ENV),
+                                               concurrency=args.workers, state_file=args.state)
+        with metrics.stage('publish') as stage:
+            result = publisher.publish(schedule, compiled.zone)
+            stage.count = result.requests
+    metrics.log()
+    print(f"Published to {publisher.url}: {result.created} created, {result.updated} updated, "
+          f"{result.deleted} deleted, {result.unchanged} unchanged ({result.requests} requests)")
+    return report_dropped(schedule)
+
+
+def cmd_preview(args):
+    metrics = RunMetrics(run='preview')
+    settings = csc_engine.load_settings(args.settings)
+    csv_file = args.csv or settings['csv_file']
+    cache = csc_cache.OccurrenceCache(args.cache, max_age_days=args.max_age_days)
+    try:
+        calendar_id = csc_cache.cached_calendar(cache, csv_file, settings, today=args.start, metrics=metrics)
+        start = args.date_from
+        end = args.date_to + timedelta(days=1) if args.date_to else None
+        if args.per_day:
+            for day, count in sorted(cache.count_by_day(calendar_id, start, end).items()):
+                print(f"{day:%Y-%m-%d %a}  {count}")
+            return 0
+        shown = 0
+        for occurrence in cache.query(calendar_id, start, end):
+            if shown == args.limit:
+                print("  ... (use --limit to show more)")
+                break
+            print(f"{occurrence.start:%Y-%m-%d %a %H:%M}-{occurrence.end:%H:%M}  {occurrence.summary}")
+            shown += 1
+    finally:
+        cache.close()
+    metrics.log()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='choresyncal', description="ChoreSynCal - Household Chores Calendar Generator")
+    parser.add_argument('--log', default='csc.log', help="log file (default: csc.log)")
+    parser.add_argument('--profile', choices=PROFILERS, help="save a cProfile or tracemalloc snapshot of each run")
+    parser.add_argument('--profile-dir', default='.', help="directory for profile snapshots (default: .)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help="generate an ICS file from a chores CSV")
+    generate.add_argument('--csv', help="chores CSV, optionally gzip-compressed (default: csv_file from the settings)")
+    generate.add_argument('--settings', default=csc_engine.SETTINGS_FILE, help="settings JSON (default: csc_settings.json)")
+    generate.add_argument('-o', '--output', required=True, help="output ICS file, '-' for stdout or tcp://host:port")
+    generate.add_argument('--start', type=parse_date, help="period start date YYYY-MM-DD (default: today)")
+    generate.add_argument('--previous', help="earlier ICS to update incrementally; unchanged events are copied verbatim")
+    generate.add_argument('--conflicts', choices=['report', 'resolve'],
+                          help="check every occurrence for overlaps, unscheduled days and runs past active hours; "
+                               "'resolve' also moves conflicting occurrences to free slots")
+    generate.add_argument('--per-member', metavar='DIR',
+                          help="also write one <member>.ics per household member into DIR (see 'members' in the settings)")
+    generate.add_argument('--error-report', help="write skipped CSV rows (line, reason) to this CSV file")
+    generate.set_defaults(func=cmd_generate)
+
+    batch = subparsers.add_parser('batch', help="generate one ICS per household from a manifest or directory")
+    batch.add_argument('source', help="JSON manifest, or directory of name.csv files with optional name.json settings")
+    batch.add_argument('-d', '--output-dir', default='.', help="directory for the generated ICS files (default: .)")
+    batch.add_argument('-j', '--workers', type=int, help="worker processes (default: one per CPU)")
+    batch.add_argument('--start', type=parse_date, help="period start date YYYY-MM-DD (default: today)")
+    batch.add_argument('--incremental', action='store_true', help="update existing ICS files, copying unchanged events verbatim")
+    batch.set_defaults(func=cmd_batch)
+
+    compare = subparsers.add_parser('compare', help="compare two ICS files, ignoring UID and DTSTAMP")
+    compare.add_argument('old', help="reference ICS file")
+    compare.add_argument('new', help="ICS file to check against it")
+    compare.add_argument('--limit', type=int, default=50, help="most differences to list (default: 50)")
+    compare.set_defaults(func=cmd_compare)
+
+    watch = subparsers.add_parser('watch', help="regenerate calendars whenever their CSV or settings change")
+    watch.add_argument('source', help="chores CSV, or directory of name.csv files with optional name.json settings")
+    watch.add_argument('--settings', default=csc_engine.SETTINGS_FILE,
+                       help="settings JSON for a single CSV (default: csc_settings.json)")
+    watch.add_argument('-o', '--output', help="output ICS file for a single CSV (default: <name>.ics in --output-dir)")
+    watch.add_argument('-d', '--output-dir', default='.', help="directory for the generated ICS files (default: .)")
+    watch.add_argument('--start', type=parse_date, help="period start date YYYY-MM-DD (default: today)")
+    watch.add_argument('--interval', type=float, default=csc_watch.POLL_INTERVAL_SECONDS,
+                       help=f"seconds between checks (default: {csc_watch.POLL_INTERVAL_SECONDS:g})")
+    watch.add_argument('--debounce', type=float, default=csc_watch.DEBOUNCE_SECONDS,
+                       help=f"seconds a file must stay unchanged before regenerating (default: {csc_watch.DEBOUNCE_SECONDS:g})")
+    watch.set_defaults(func=cmd_watch)
+
+    serve = subparsers.add_parser('serve', help="serve each household's calendar for webcal subscription")
+    serve.add_argument('source', help="JSON manifest, or directory of name.csv files with optional name.json settings")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument('--port', type=int, default=csc_server.DEFAULT_PORT,
+                       help=f"port to listen on (default: {csc_server.DEFAULT_PORT})")
+    serve.add_argument('--cache-mb', type=int, default=csc_server.DEFAULT_CACHE_BYTES >> 20,
+                       help=f"memory for rendered calendars, in MB (default: {csc_server.DEFAULT_CACHE_BYTES >> 20})")
+    serve.set_defaults(func=cmd_serve)
+
+    publish = subparsers.add_parser('publish', help="PUT the calendar's events to a CalDAV collection, sending only changes")
+    publish.add_argument('url', help="CalDAV collection URL, e.g. https://dav.example.com/calendars/smiths/chores/")
+    publish.add_argument('--csv', help="chores CSV, optionally gzip-compressed (default: csv_file from the settings)")
+    publish.add_argument('--settings', default=csc_engine.SETTINGS_FILE, help="settings JSON (default: csc_settings.json)")
+    publish.add_argument('--start', type=parse_date, help="period start date YYYY-MM-DD (default: today)")
+    publish.add_argument('--user', help="user name for HTTP basic auth; the password is read from $CSC_CALDAV_PASSWORD")
+    publish.add_argument('-j', '--workers', type=int, default=csc_caldav.DEFAULT_CONCURRENCY,
+                         help=f"requests in flight at once (default: {csc_caldav.DEFAULT_CONCURRENCY})")
+    publish.add_argument('--state', default=csc_caldav.STATE_FILE,
+                         help="file recording what was last published (default: csc_publish_state.json)")
+    publish.set_defaults(func=cmd_publish)
+
+    preview = subparsers.add_parser('preview', help="list occurrences from the on-disk cache, scheduling only on a miss")
+    preview.add_argument('--csv', help="chores CSV, optionally gzip-compressed (default: csv_file from the settings)")
+    preview.add_argument('--settings', default=csc_engine.SETTINGS_FILE, help="settings JSON (default: csc_settings.json)")
+    preview.add_argument('--start', type=parse_date, help="period start date YYYY-MM-DD (default: today)")
+    preview.add_argument('--from', dest='date_from', type=parse_date, help="first day to list YYYY-MM-DD")
+    preview.add_argument('--to', dest='date_to', type=parse_date, help="last day to list YYYY-MM-DD")
+    preview.add_argument('--per-day', action='store_true', help="print the number of occurrences per day instead")
+    preview.add_argument('--limit', type=int, default=200, help="most occurrences to list (default: 200)")
+    preview.add_argument('--cache', default=csc_cache.CACHE_FILE, help="occurrence cache file (default: csc_cache.sqlite)")
+    preview.add_argument('--max-age-days', type=int, default=30, help="drop cache entries unused this long (default: 30)")
+    preview.set_defaults(func=cmd_preview)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        filename=args.log,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    try:
+        return args.func(args)
+    except csc_engine.ChoreSynCalError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        logging.error(f"Unexpected error in {args.command}: {str(e)}")
+        print(f"Unexpected error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
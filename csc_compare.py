@@ -0,0 +1,117 @@
+"""Compare two calendars event by event, ignoring UID and DTSTAMP.
+
+Used to prove that a change to the scheduler still produces the same
+calendar as a reference file (e.g. those in test-ics-files/):
+
+    python choresyncal.py compare test-ics-files/04.ChoreSynCal.1yr.0-5-0.ics new.ics
+
+Both files are scanned in one streaming pass each (see
+csc_ics.iter_event_blocks). Events are matched on their text with the UID
+and DTSTAMP lines removed, so only events that differ are parsed; of those,
+events with the same SUMMARY on both sides are reported as moved, the rest
+as added or removed.
+"""
+import re
+from collections import deque, namedtuple
+
+from csc_ics import iter_event_blocks, parse_event
+
+# Properties that change on every run, so never count as a difference
+IGNORED_PROPERTIES = frozenset(['UID', 'DTSTAMP'])
+IGNORED_LINES = re.compile(r'\n(?:UID|DTSTAMP)[;:][^\n]*')
+
+CalendarDiff = namedtuple('CalendarDiff', ['unchanged', 'added', 'removed', 'moved'])
+# A matched pair of events whose content differs; changes is a tuple of (property, old value, new value)
+MovedEvent = namedtuple('MovedEvent', ['old', 'new', 'changes'])
+
+
+def event_key(block):
+    """Content key for an unfolded VEVENT: its text without the UID and DTSTAMP lines."""
+    return IGNORED_LINES.sub('', block)
+
+
+def property_name(name):
+    return name.partition(';')[0]
+
+
+def event_summary(event):
+    for name, value in event.properties:
+        if property_name(name) == 'SUMMARY':
+            return value
+    return ''
+
+
+def event_changes(old, new):
+    old_values = {name: value for name, value in old.properties if property_name(name) not in IGNORED_PROPERTIES}
+    new_values = {name: value for name, value in new.properties if property_name(name) not in IGNORED_PROPERTIES}
+    changes = []
+    for name in sorted(old_values.keys() | new_values.keys()):
+        if old_values.get(name) != new_values.get(name):
+            changes.append((name, old_values.get(name), new_values.get(name)))
+    if old.alarms != new.alarms:
+        changes.append(('VALARM', f"{len(old.alarms)} alarms", f"{len(new.alarms)} alarms"))
+    return tuple(changes)
+
+
+def compare_calendars(old_stream, new_stream):
+    """Compare two ICS byte streams and return a CalendarDiff.
+
+    unchanged is a count; added and removed are lists of csc_ics.ParsedEvent;
+    moved is a list of MovedEvent. Repeated identical events are matched one
+    for one, so a duplicated chore shows up as added rather than hidden.
+    """
+    # Index the old calendar by content key, keeping file order for duplicates
+    old_by_key = {}
+    for number, block in iter_event_blocks(old_stream):
+        old_by_key.setdefault(event_key(block), deque()).append((number, block))
+
+    unchanged = 0
+    unmatched_new = []
+    for number, block in iter_event_blocks(new_stream):
+        matches = old_by_key.get(event_key(block))
+        if matches:
+            matches.popleft()
+            unchanged += 1
+        else:
+            unmatched_new.append(parse_event(number, block))
+
+    # Pair what is left by SUMMARY, in file order: the same chore at a different time
+    leftovers = sorted(entry for entries in old_by_key.values() for entry in entries)
+    unmatched_old = {}
+    for number, block in leftovers:
+        event = parse_event(number, block)
+        unmatched_old.setdefault(event_summary(event), deque()).append(event)
+
+    added, moved = [], []
+    for event in unmatched_new:
+        candidates = unmatched_old.get(event_summary(event))
+        if candidates:
+            old = candidates.popleft()
+            moved.append(MovedEvent(old, event, event_changes(old, event)))
+        else:
+            added.append(event)
+    removed = sorted((event for events in unmatched_old.values() for event in events), key=lambda event: event.line)
+    return CalendarDiff(unchanged, added, removed, moved)
+
+
+def compare_files(old_file, new_file):
+    with open(old_file, 'rb') as old_stream, open(new_file, 'rb') as new_stream:
+        return compare_calendars(old_stream, new_stream)
+
+
+def format_diff(diff, limit=None):
+    """Yield report lines: '+' added, '-' removed, '~' moved, then a summary line."""
+    entries = []
+    for event in diff.removed:
+        entries.append(f"- line {event.line}: {event_summary(event)}")
+    for event in diff.added:
+        entries.append(f"+ line {event.line}: {event_summary(event)}")
+    for old, new, changes in diff.moved:
+        details = ', '.join(f"{name} {old_value} -> {new_value}" for name, old_value, new_value in changes)
+        entries.append(f"~ line {old.line} -> {new.line}: {event_summary(new)}: {details}")
+    shown = entries if limit is None else entries[:limit]
+    yield from shown
+    if len(entries) > len(shown):
+        yield f"... and {len(entries) - len(shown)} more"
+    yield (f"{diff.unchanged} unchanged, {len(diff.added)} added, {len(diff.removed)} removed, "
+           f"{len(diff.moved)} moved")
@@ -0,0 +1,399 @@
+"""Occurrence expansion and conflict detection for scheduled calendars.
+
+Chores are placed once, in the first weeks of the period, and repeat through
+RRULEs; their later occurrences can land on top of other chores (a monthly
+chore's date drifts across weekdays), on days that are not scheduled (a
+monthly chore falling on a weekend) or past the end of active hours.
+find_conflicts expands every event into its occurrences and checks them all
+in one sweep over them in time order, O(n log n) in the number of
+occurrences.
+resolve_conflicts moves each conflicting occurrence to the next slot where
+nothing else is running for its whole duration, as an EXDATE on its series
+plus a one-off event.
+
+Occurrences are handled as integer keys (start minute * event count + event
+index) so a Year calendar's millions of occurrences sort and sweep without
+building a datetime for each; Occurrence records are only made for results.
+They are produced lazily, each series' RRULE expanded as it is consumed and
+the series merged a window at a time, so memory holds one window's
+occurrences however long the period is.
+"""
+import bisect
+import calendar
+import itertools
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from csc_engine import UID_NAMESPACE, ScheduledEvent, SlotLayout
+
+# One occurrence of a scheduled event; index is the event's position in the events list
+Occurrence = namedtuple('Occurrence', ['start', 'index', 'end'])
+# kind is 'overlap' (other is the occurrence it collides with), 'unavailable_day' or 'past_active_end'
+Conflict = namedtuple('Conflict', ['kind', 'occurrence', 'other'])
+
+CONFLICT_KINDS = ('overlap', 'unavailable_day', 'past_active_end')
+MINUTES_PER_DAY = 24 * 60
+# occurrence_keys merges the series this many days (a quarter) at a time
+MERGE_WINDOW_DAYS = 91
+
+
+def to_minutes(value):
+    """Minutes since 0001-01-01 00:00 (day 1 is a Monday, so weekday = (minutes // 1440 + 6) % 7)."""
+    return value.toordinal() * MINUTES_PER_DAY + value.hour * 60 + value.minute
+
+
+def from_minutes(minutes):
+    day, minute = divmod(minutes, MINUTES_PER_DAY)
+    return datetime.fromordinal(day) + timedelta(minutes=minute)
+
+
+def duration_minutes(event):
+    return int((event.end - event.start).total_seconds() // 60)
+
+
+def add_months(value, months):
+    """value shifted by whole months, or None if that month has no such day (RFC 5545 skips it)."""
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    if value.day > calendar.monthrange(year, month)[1]:
+        return None
+    return value.replace(year=year, month=month)
+
+
+def monthly_minutes(first, interval, until):
+    """Starts of a MONTHLY rule from first (a datetime) up to until, in to_minutes form."""
+    months = 0
+    while True:
+        start = add_months(first, months)
+        months += interval
+        if start is None:
+            continue
+        start = to_minutes(start)
+        if start > until:
+            return
+        yield start
+
+
+def occurrence_minutes(event):
+    """Start of each occurrence of a ScheduledEvent in order, in to_minutes form (its RRULE minus EXDATEs).
+
+    Returns an iterable that expands the rule as it is consumed: a range for
+    DAILY and WEEKLY rules without EXDATEs, otherwise a generator.
+    """
+    first = to_minutes(event.start)
+    rrule = event.rrule
+    if rrule is None:
+        return [first]
+    # The scheduler always bounds its rules by the period end
+    until = to_minutes(rrule['UNTIL'])
+    interval = int(rrule.get('INTERVAL', 1))
+    if rrule['FREQ'] in ('DAILY', 'WEEKLY'):
+        step = interval * MINUTES_PER_DAY * (7 if rrule['FREQ'] == 'WEEKLY' else 1)
+        starts = range(first, until + 1, step)
+    elif rrule['FREQ'] == 'MONTHLY':
+        starts = monthly_minutes(event.start, interval, until)
+    else:
+        raise ValueError(f"Unsupported RRULE frequency: {rrule['FREQ']}")
+    if event.exdates:
+        excluded = set(to_minutes(exdate) for exdate in event.exdates)
+        starts = (start for start in starts if start not in excluded)
+    return starts
+
+
+def event_keys(event, index, count):
+    """The keys of one event's occurrences, in order: a range where the rule allows, else an iterator."""
+    starts = occurrence_minutes(event)
+    if isinstance(starts, range):
+        return range(starts.start * count + index, starts.stop * count, starts.step * count)
+    return (start * count + index for start in starts)
+
+
+def occurrence_keys(events):
+    """Keys start * len(events) + index for every occurrence, in time order, earlier-scheduled series first on ties.
+
+    A lazy iterator over occurrence_windows, so only one window's keys are
+    held at a time.
+    """
+    return itertools.chain.from_iterable(occurrence_windows(events))
+
+
+def occurrence_windows(events):
+    """Sorted lists of occurrence keys, one per MERGE_WINDOW_DAYS with any occurrences, in time order.
+
+    Each series waits in the bucket of the window its next occurrence falls
+    in; a window takes the keys of the series in its bucket up to its end,
+    re-files each under its next window, and sorts what it took.
+    """
+    count = len(events)
+    window = MERGE_WINDOW_DAYS * MINUTES_PER_DAY * count
+    pending = []  # (next key, remaining keys: a range starting at that key, or an iterator after it)
+    for index, event in enumerate(events):
+        keys = event_keys(event, index, count)
+        if isinstance(keys, range):
+            if keys:
+                pending.append((keys.start, keys))
+        else:
+            first = next(keys, None)
+            if first is not None:
+                pending.append((first, keys))
+    if not pending:
+        return
+    base = min(key for key, _ in pending)
+    buckets = [[]]  # window number (from base) -> series whose next occurrence falls in it
+
+    def file_series(key, keys):
+        number = (key - base) // window
+        while len(buckets) <= number:
+            buckets.append([])
+        buckets[number].append((key, keys))
+
+    for key, keys in pending:
+        file_series(key, keys)
+    del pending
+    number = 0
+    while number < len(buckets):
+        due, buckets[number] = buckets[number], None
+        end = base + (number + 1) * window
+        number += 1
+        batch = []
+        for key, keys in due:
+            if isinstance(keys, range):
+                # Slicing keeps a regular series' keys in C
+                taken = -(-(end - key) // keys.step)
+                batch.extend(keys[:taken])
+                keys = keys[taken:]
+                if keys:
+                    file_series(keys.start, keys)
+            else:
+                while key is not None and key < end:
+                    batch.append(key)
+                    key = next(keys, None)
+                if key is not None:
+                    file_series(key, keys)
+        if batch:
+            batch.sort()
+            yield batch
+
+
+def make_occurrence(events, key):
+    start, index = divmod(key, len(events))
+    return Occurrence(from_minutes(start), index, from_minutes(start + duration_minutes(events[index])))
+
+
+def expand_occurrences(events):
+    """Yield every Occurrence of events in (start, index) order."""
+    for key in occurrence_keys(events):
+        yield make_occurrence(events, key)
+
+
+def find_conflicts(events, settings, keys=None, layout=None):
+    """Check every occurrence of events against settings (a csc_engine.CompiledSettings).
+
+    Returns a list of Conflicts in time order. layout is the Schedule's
+    csc_engine.SlotLayout. In stagger slots, overlap is judged on slots, not
+    DTSTART-DTEND: an occurrence holds its slot for one stagger step (or its
+    whole length, if shorter), since hour-long chores are staggered by as
+    little as a few minutes, and with a stagger of 0 chores are meant to
+    share a start time, so overlaps are not reported. Packed chores hold
+    their whole length.
+    """
+    if keys is None:
+        keys = occurrence_keys(events)
+    packing = layout is not None and layout.packing
+    count = len(events)
+    day_open = [settings.schedule_weekdays if weekday < 5 else settings.schedule_weekends for weekday in range(7)]
+    active_end = settings.active_end
+    durations = [duration_minutes(event) for event in events]
+    stagger = settings.stagger_minutes
+    slot_lengths = durations if packing else [min(duration, stagger) for duration in durations]
+    check_overlaps = packing or stagger > 0
+
+    found = []  # (kind, key, other key)
+    # Sweep: the occurrence whose slot reaches furthest so far; anything starting before that end overlaps it
+    reach, holder = None, None
+    for key in keys:
+        start, index = divmod(key, count)
+        day, minute = divmod(start, MINUTES_PER_DAY)
+        open_day = day_open[(day + 6) % 7]
+        if not open_day:
+            found.append(('unavailable_day', key, None))
+        if minute + durations[index] > active_end:
+            found.append(('past_active_end', key, None))
+        if check_overlaps and open_day:
+            # Occurrences on unavailable days have to move anyway, so they never block a slot
+            if reach is not None and start < reach:
+                found.append(('overlap', key, holder))
+            elif reach is None or start + slot_lengths[index] > reach:
+                reach, holder = start + slot_lengths[index], key
+    return [Conflict(kind, make_occurrence(events, key), None if other is None else make_occurrence(events, other))
+            for kind, key, other in found]
+
+
+class FreeSlots:
+    """Free time in the period, handed out earliest-first on or after a given time.
+
+    Occupied time is the occurrences that stay, as disjoint [start, end)
+    intervals in order (overlapping chores merge into one block, so a day
+    usually costs an interval or two), plus the intervals held per day for
+    occurrences that are moving or have moved. A moved occurrence takes the
+    first stagger-grid start (any minute for packed chores with no stagger)
+    where its whole duration is free of both and still ends within active
+    hours; a start that is taken jumps straight past whatever blocks it.
+    Days with no room left for a duration are skipped through a
+    path-compressed next-day pointer, so finding a slot stays cheap even
+    when most of the period is full.
+    """
+
+    def __init__(self, settings, busy_starts, busy_ends, layout=None):
+        layout = layout or SlotLayout(False, settings.first_slot)
+        self.days = settings.available_days
+        self.first_slot = layout.first_slot
+        # Packed chores with no stagger follow each other back to back, so they may start at any minute
+        self.step = settings.stagger_minutes or 1
+        self.active_end = settings.active_end
+        # Chores in stagger slots with no stagger share the one slot
+        self.shared = settings.stagger_minutes == 0 and not layout.packing
+        self.busy_starts = busy_starts
+        self.busy_ends = busy_ends
+        self.held = {}  # day number -> [start, end) intervals held on it
+        # next_day[duration][p] is a day position at or after p that may still have room (p itself if absent)
+        self.next_day = {}
+
+    def hold(self, start, end):
+        self.held.setdefault(start // MINUTES_PER_DAY, []).append((start, end))
+
+    def release(self, start, end):
+        self.held[start // MINUTES_PER_DAY].remove((start, end))
+
+    def _find(self, next_day, position):
+        root = position
+        while next_day.get(root, root) != root:
+            root = next_day[root]
+        while next_day.get(position, position) != root:
+            next_day[position], position = root, next_day[position]
+        return root
+
+    def _blocked_until(self, start, end):
+        """None if [start, end) is free, else the end of the latest interval in its way."""
+        blocked = None
+        # The busy intervals are disjoint and in order: only the last one starting before end can reach start
+        i = bisect.bisect_left(self.busy_starts, end) - 1
+        if i >= 0 and self.busy_ends[i] > start:
+            blocked = self.busy_ends[i]
+        day = start // MINUTES_PER_DAY
+        # Held intervals are filed under the day they start, and one may run on past midnight
+        for held_day in (day - 1, day):
+            for held_start, held_end in self.held.get(held_day, ()):
+                if held_start < end and start < held_end and (blocked is None or held_end > blocked):
+                    blocked = held_end
+        return blocked
+
+    def take(self, after, duration):
+        """Claim the first free start at or after minute after for duration minutes; None if the period is full."""
+        first, step = self.first_slot, self.step
+        last_start = self.active_end - duration
+        next_day = self.next_day.setdefault(duration, {})
+        days = self.days
+        position = self._find(next_day, days.position(date.fromordinal(after // MINUTES_PER_DAY)))
+        while first <= last_start and position < len(days):
+            midnight = (days.first_ordinal + days.offset(position)) * MINUTES_PER_DAY
+            # The first grid start at or after after
+            minute = first + max(-(-(after - midnight - first) // step), 0) * step
+            while minute <= last_start:
+                start = midnight + minute
+                # With a stagger of 0 chores share the slot, so only the day itself matters
+                blocked = None if self.shared else self._blocked_until(start, start + duration)
+                if blocked is None:
+                    self.hold(start, start + duration)
+                    return start
+                # Every start before blocked overlaps what blocks it: go to the first grid start after it
+                minute += -(-(blocked - start) // step) * step
+            if after <= midnight + first:
+                # The whole day was looked at, and it only fills up from here on
+                next_day[position] = position + 1
+            position = self._find(next_day, position + 1)
+        return None
+
+
+def moved_uid(event, original_start):
+    """Stable UID for the one-off event that replaces a moved occurrence."""
+    return str(uuid.uuid5(UID_NAMESPACE, f"{event.uid}\x1fmoved\x1f{original_start:%Y%m%dT%H%M%S}"))
+
+
+def resolve_conflicts(events, settings, layout=None):
+    """Move overlapping and unavailable-day occurrences to the next free slot.
+
+    Returns (events, conflicts): the events with an EXDATE for each moved
+    occurrence plus one-off events at the new times, and the conflicts that
+    were found. Occurrences past active_end are reported but left in place,
+    as they come from the series' own start time, which every occurrence
+    shares; occurrences with no free slot left in the period stay put too.
+    layout is the Schedule's csc_engine.SlotLayout, as for find_conflicts.
+    """
+    events = list(events)
+    conflicts = find_conflicts(events, settings, layout=layout)
+    count = len(events)
+    to_move = sorted(set(to_minutes(conflict.occurrence.start) * count + conflict.occurrence.index
+                         for conflict in conflicts if conflict.kind != 'past_active_end'))
+    if not to_move:
+        return events, conflicts
+
+    # Time still taken once the moving occurrences are taken out, as disjoint intervals in order
+    moving = set(to_move)
+    durations = [duration_minutes(event) for event in events]
+    busy_starts, busy_ends = [], []
+    for key in occurrence_keys(events):
+        if key in moving:
+            continue
+        start, index = divmod(key, count)
+        end = start + durations[index]
+        if busy_ends and start <= busy_ends[-1]:
+            busy_ends[-1] = max(busy_ends[-1], end)
+        else:
+            busy_starts.append(start)
+            busy_ends.append(end)
+    slots = FreeSlots(settings, busy_starts, busy_ends, layout)
+    # Moving occurrences hold their time until they move, as those with no slot left stay where they are
+    for key in to_move:
+        original, index = divmod(key, count)
+        slots.hold(original, original + durations[index])
+
+    new_starts = {}  # one-off event index -> new start
+    exdates = {}  # series index -> moved occurrence starts
+    moved = []
+    for key in to_move:
+        original, index = divmod(key, count)
+        slots.release(original, original + durations[index])
+        start = slots.take(original, durations[index])
+        if start is None:
+            slots.hold(original, original + durations[index])
+            continue
+        event = events[index]
+        start, original = from_minutes(start), from_minutes(original)
+        if event.rrule is None:
+            new_starts[index] = start
+            continue
+        exdates.setdefault(index, []).append(original)
+        moved.append(ScheduledEvent(event.summary, start, start + (event.end - event.start), None, event.triggers,
+                                    event.alarm_description, event.frequency, moved_uid(event, original), (),
+                                    event.assignee))
+
+    resolved = []
+    for index, event in enumerate(events):
+        if index in new_starts:
+            start = new_starts[index]
+            resolved.append(event._replace(start=start, end=start + (event.end - event.start)))
+        elif index in exdates:
+            resolved.append(event._replace(exdates=tuple(sorted(set(event.exdates) | set(exdates[index])))))
+        else:
+            resolved.append(event)
+    return resolved + moved, conflicts
+
+
+def summarize_conflicts(conflicts):
+    """Count conflicts by kind, in CONFLICT_KINDS order."""
+    counts = dict.fromkeys(CONFLICT_KINDS, 0)
+    for conflict in conflicts:
+        counts[conflict.kind] += 1
+    return counts
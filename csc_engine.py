@@ -0,0 +1,943 @@
+"""Headless ChoreSynCal scheduling engine.
+
+Everything needed to turn a chore list and a settings profile into calendar
+events lives here, so it can run from the CLI, cron jobs or worker processes
+without a display. Nothing in this module imports tkinter.
+"""
+import calendar
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta
+from math import ceil
+
+from csc_ics import ICSWriter
+from csc_members import Member, assign_members, parse_members
+from csc_metrics import RunMetrics
+from csc_timezone import utc_now
+import csc_timezone
+import csc_vectorized
+
+SETTINGS_FILE = 'csc_settings.json'
+# Chore count from which schedule_chores switches to NumPy slot placement when numpy is installed
+VECTORIZE_THRESHOLD = 2000
+REQUIRED_COLUMNS = ['Frequency', 'Room', 'Task']
+# Optional column naming the member who always does a chore (see csc_members)
+ASSIGNEE_COLUMN = 'Assignee'
+# Optional column with each chore's length; when present, days are packed by time used (see PackingAllocator)
+DURATION_COLUMN = 'Duration'
+DEFAULT_DURATION_MINUTES = 60
+
+# Same defaults as the GUI fields; settings files only need to override what differs
+DEFAULT_SETTINGS = {
+    'csv_file': '',
+    'active_start': '08:00',
+    'active_end': '18:00',
+    'time_of_day': '09:00',
+    'period': 'Month',
+    'reminder_days': '7',
+    'reminder_1hr': False,
+    'reminder_30min': True,
+    'reminder_10min': False,
+    'reminder_1day': False,
+    'stagger_interval': '30',
+    'schedule_weekdays': True,
+    'schedule_weekends': True,
+    'members': '',
+    'timezone': '',
+}
+
+# The 'period' setting: the calendar Month or Year, or a rolling length from today such as
+# '6 weeks', '3 months', 'Rolling 12 months' or '2 years'
+CALENDAR_PERIODS = {'Month': 'month', 'Year': 'year'}
+PERIOD_PATTERN = re.compile(r'^\s*(?:rolling\s+)?(\d+)\s*(week|month|year)s?\s*$', re.IGNORECASE)
+PERIOD_CHOICES = ('Month', 'Year', '4 weeks', '3 months', 'Rolling 12 months', '2 years')
+
+# Namespace for deterministic event UIDs (see chore_uid)
+UID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, 'choresyncal')
+
+# Normalized chore frequencies; rows with any other Frequency are not scheduled
+DAILY, WEEKLY, MONTHLY = 'daily', 'weekly', 'monthly'
+FREQUENCIES = {DAILY: DAILY, WEEKLY: WEEKLY, MONTHLY: MONTHLY}
+
+# write_calendar reports progress after every this many events
+PROGRESS_INTERVAL = 250
+
+# CSV files are read through a buffer of this many bytes, so large chore lists stream in chunks
+READ_BUFFER_SIZE = 1 << 20
+
+# One chore row, normalized at load: frequency is one of DAILY/WEEKLY/MONTHLY, room is interned,
+# and the event summary and alarm description are built once; assignee and duration (minutes) come
+# from the optional Assignee and Duration columns
+Chore = namedtuple('Chore', ['frequency', 'room', 'task', 'summary', 'alarm_description', 'assignee', 'duration'],
+                   defaults=(None, None))
+
+# A CSV row that was skipped; line is the file line the row ends on
+RowError = namedtuple('RowError', ['line', 'reason'])
+
+# One scheduled calendar entry; rrule is None for one-off events (re-import reminder),
+# exdates lists occurrence starts removed from the rrule (see csc_conflicts),
+# assignee is the csc_members.Member doing it, if members are in use
+ScheduledEvent = namedtuple('ScheduledEvent', [
+    'summary', 'start', 'end', 'rrule', 'triggers', 'alarm_description', 'frequency', 'uid', 'exdates',
+    'assignee'], defaults=(None,))
+
+# How a run's chores sit in the day: packed by duration (any chore has a Duration) or in stagger slots,
+# and the minute of the day the first one starts
+SlotLayout = namedtuple('SlotLayout', ['packing', 'first_slot'])
+
+
+class ChoreSynCalError(Exception):
+    """Base error for problems the user can fix (bad settings, bad CSV)."""
+
+
+class SettingsError(ChoreSynCalError):
+    pass
+
+
+class ChoreFileError(ChoreSynCalError):
+    pass
+
+
+class GenerationCancelled(ChoreSynCalError):
+    """Raised from a progress callback to stop a run part way through."""
+
+
+def load_settings(path=SETTINGS_FILE):
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            settings.update(json.load(f))
+        logging.info(f"Settings loaded from {path}")
+    return settings
+
+
+def save_settings(settings, path=SETTINGS_FILE):
+    with open(path, 'w') as f:
+        json.dump(settings, f, indent=4)
+    logging.info(f"Settings saved to {path}")
+
+
+def validate_time(time_str):
+    try:
+        datetime.strptime(time_str, "%H:%M")
+        return True
+    except ValueError:
+        return False
+
+
+def validate_days(days_str):
+    try:
+        days = int(days_str)
+        return days > 0
+    except ValueError:
+        return False
+
+
+def validate_stagger(stagger_str):
+    try:
+        minutes = int(stagger_str)
+        return minutes >= 0
+    except ValueError:
+        return False
+
+
+def validate_active_hours(start_str, end_str):
+    try:
+        if not (validate_time(start_str) and validate_time(end_str)):
+            return False
+        start_time = datetime.strptime(start_str, "%H:%M")
+        end_time = datetime.strptime(end_str, "%H:%M")
+        return end_time > start_time
+    except Exception as e:
+        logging.error(f"Error validating active hours: {str(e)}")
+        return False
+
+
+def validate_reminder_days(days_str, start_date, end_date):
+    try:
+        days = int(days_str)
+        if days <= 0:
+            return False
+        # The re-import date has to fall within the period, so days can be at most the period's length
+        reimport_date = end_date - timedelta(days=days)
+        return start_date.date() <= reimport_date.date() <= end_date.date()
+    except Exception as e:
+        logging.error(f"Error validating reminder days: {str(e)}")
+        return False
+
+
+def parse_period(period):
+    """(count, unit) for a period setting: 'Month' and 'Year' are the calendar ones, or e.g. '6 weeks'.
+
+    unit is 'week', 'month' or 'year'; count is None for the calendar Month
+    and Year, which end at the end of the current month and year. Raises
+    SettingsError if period is not one of these.
+    """
+    period = str(period or '').strip()
+    if period.capitalize() in CALENDAR_PERIODS:
+        return None, CALENDAR_PERIODS[period.capitalize()]
+    match = PERIOD_PATTERN.match(period)
+    if match is None or int(match.group(1)) <= 0:
+        logging.error(f"Invalid period: {period}")
+        raise SettingsError("Invalid period. Use Month, Year, or a length such as '6 weeks', '3 months', "
+                            "'Rolling 12 months' or '2 years'")
+    return int(match.group(1)), match.group(2).lower()
+
+
+def add_months_clamped(value, months):
+    """value shifted by whole months, clamped to the last day of a shorter month."""
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def get_period_bounds(period, today=None):
+    # Periods always start today at midnight
+    start_date = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    count, unit = parse_period(period)
+    if count is None:
+        if unit == 'month':
+            end_date = (start_date.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        else:  # Year
+            end_date = start_date.replace(month=12, day=31)
+    elif unit == 'week':
+        end_date = start_date + timedelta(days=7 * count - 1)
+    else:
+        # Rolling: N months from today ends the day before the same date N months on
+        end_date = add_months_clamped(start_date, count * (12 if unit == 'year' else 1)) - timedelta(days=1)
+    return start_date, end_date
+
+
+def validate_settings(settings, start_date, end_date):
+    """Raise SettingsError with a user-facing message for the first invalid setting."""
+    if not validate_time(settings['time_of_day']):
+        logging.error(f"Invalid time format: {settings['time_of_day']}")
+        raise SettingsError("Invalid time format. Use HH:MM (24-hour)")
+    if not validate_days(settings['reminder_days']):
+        logging.error(f"Invalid reminder days: {settings['reminder_days']}")
+        raise SettingsError("Reminder days must be a positive integer")
+    if not validate_stagger(settings['stagger_interval']):
+        logging.error(f"Invalid stagger interval: {settings['stagger_interval']}")
+        raise SettingsError("Stagger interval must be a non-negative integer")
+    if not (settings['schedule_weekdays'] or settings['schedule_weekends']):
+        logging.error("No day type selected (Weekdays/Weekends)")
+        raise SettingsError("Select at least one: Weekdays or Weekends")
+    if not validate_active_hours(settings['active_start'], settings['active_end']):
+        logging.error(f"Invalid active hours: start={settings['active_start']}, end={settings['active_end']}")
+        raise SettingsError("Invalid active hours. Ensure start and end are HH:MM and end is after start")
+    if not validate_reminder_days(settings['reminder_days'], start_date, end_date):
+        logging.error(f"Invalid re-import reminder days: {settings['reminder_days']} for period {settings['period']}")
+        raise SettingsError("Invalid re-import reminder days. Must be positive and fall within the period")
+
+
+class ChoreGroups:
+    """Valid chores bucketed by frequency (file order within each bucket), plus the rows that were skipped."""
+    __slots__ = ('groups', 'errors')
+
+    def __init__(self):
+        self.groups = {frequency: [] for frequency in FREQUENCIES}
+        self.errors = []
+
+    def __len__(self):
+        return sum(len(group) for group in self.groups.values())
+
+    def __iter__(self):
+        for group in self.groups.values():
+            yield from group
+
+
+def open_chores_file(csv_path):
+    """Open a chores CSV for reading as text; gzip-compressed files are detected by their magic bytes."""
+    with open(csv_path, 'rb') as f:
+        gzipped = f.read(2) == b'\x1f\x8b'
+    # Small files do not need the full chunk buffer
+    buffer_size = max(io.DEFAULT_BUFFER_SIZE, min(READ_BUFFER_SIZE, os.path.getsize(csv_path)))
+    if gzipped:
+        return io.TextIOWrapper(io.BufferedReader(gzip.open(csv_path, 'rb'), buffer_size), newline='')
+    return open(csv_path, newline='', buffering=buffer_size)
+
+
+def read_chores(csv_path):
+    """Read and validate a chores CSV (plain or gzip) in one streaming pass.
+
+    Returns a ChoreGroups. Rows that cannot be scheduled (unknown Frequency,
+    empty Room or Task) are recorded in its errors with their line number
+    instead of failing the whole file; a missing column still raises.
+    """
+    if not csv_path:
+        logging.error("No CSV file selected")
+        raise ChoreFileError("Please select a CSV file")
+    if not os.path.exists(csv_path):
+        logging.error(f"CSV file does not exist: {csv_path}")
+        raise ChoreFileError("Selected CSV file does not exist")
+    chores = ChoreGroups()
+    groups = chores.groups
+    errors = chores.errors
+    try:
+        with open_chores_file(csv_path) as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, [])
+            missing = [field for field in REQUIRED_COLUMNS if field not in header]
+            if missing:
+                logging.error(f"CSV missing required columns: {', '.join(missing)}")
+                raise ChoreFileError(f"CSV must contain Frequency, Room, and Task columns (missing: {', '.join(missing)})")
+            frequency_col, room_col, task_col = (header.index(field) for field in REQUIRED_COLUMNS)
+            width = max(frequency_col, room_col, task_col) + 1
+            assignee_col = header.index(ASSIGNEE_COLUMN) if ASSIGNEE_COLUMN in header else None
+            duration_col = header.index(DURATION_COLUMN) if DURATION_COLUMN in header else None
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) < width:
+                    errors.append(RowError(reader.line_num, f"expected at least {width} fields, found {len(row)}"))
+                    continue
+                frequency, room, task = row[frequency_col], row[room_col], row[task_col]
+                normalized = FREQUENCIES.get(frequency.lower())
+                if normalized is None:
+                    errors.append(RowError(reader.line_num, f"unknown Frequency '{frequency}' (expected Daily, Weekly or Monthly)"))
+                elif not room.strip():
+                    errors.append(RowError(reader.line_num, "empty Room"))
+                elif not task.strip():
+                    errors.append(RowError(reader.line_num, "empty Task"))
+                else:
+                    # A short row just leaves the optional columns out
+                    assignee = row[assignee_col].strip() if assignee_col is not None and assignee_col < len(row) else ''
+                    duration = row[duration_col].strip() if duration_col is not None and duration_col < len(row) else ''
+                    minutes = parse_duration(duration) if duration else None
+                    if minutes == 0:
+                        errors.append(RowError(reader.line_num, f"invalid Duration '{duration}' (expected minutes, e.g. 45, or H:MM)"))
+                        continue
+                    groups[normalized].append(make_chore(normalized, room, task, assignee or None, minutes))
+    except ChoreFileError:
+        raise
+    except Exception as e:
+        logging.error(f"Failed to read CSV: {str(e)}")
+        raise ChoreFileError(f"Failed to read CSV: {str(e)}")
+    logging.info(f"Successfully read CSV: {csv_path} ({len(chores)} chores)")
+    if errors:
+        logging.warning(f"Skipped {len(errors)} invalid rows in {csv_path}")
+    return chores
+
+
+def write_error_report(errors, path):
+    """Write skipped rows to a CSV report with line and reason columns."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['line', 'reason'])
+        writer.writerows(errors)
+    logging.info(f"Row error report written to {path}")
+
+
+def format_row_errors(errors, limit=10):
+    """Summarize skipped rows for a message: the first limit of them, one per line."""
+    lines = [f"Line {error.line}: {error.reason}" for error in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"... and {len(errors) - limit} more")
+    return '\n'.join(lines)
+
+
+def format_dropped(count):
+    """The message for chores a Schedule left out (see Schedule.dropped)."""
+    return (f"{count} chores found no free slot before the end of the period and were left out; "
+            "widen the active hours, shorten the stagger interval or choose a longer period")
+
+
+def make_chore(frequency, room, task, assignee=None, duration=None):
+    """Build a Chore; frequency must already be normalized (DAILY, WEEKLY or MONTHLY)."""
+    # Shared catalogs repeat a handful of rooms thousands of times
+    room = sys.intern(room)
+    summary = f"{room}: {task}"
+    return Chore(frequency, room, task, summary, f"Reminder: {summary}", assignee, duration)
+
+
+def parse_duration(value):
+    """Minutes in a Duration cell ('45' or '1:30'); 0 if it is not a positive length."""
+    try:
+        if ':' in value:
+            hours, minutes = value.split(':')
+            total = int(hours) * 60 + int(minutes)
+        else:
+            total = int(value)
+    except ValueError:
+        return 0
+    return max(total, 0)
+
+
+def chore_uid(calendar_id, *identity):
+    """Stable UID for a chore, so regenerated calendars update events instead of replacing them.
+
+    calendar_id (the optional 'calendar_id' setting) keeps households that
+    share a chore list from colliding in one calendar account.
+    """
+    return str(uuid.uuid5(UID_NAMESPACE, '\x1f'.join([calendar_id, *identity])))
+
+
+def get_reminder_triggers(frequency, settings):
+    triggers = []
+    if settings['reminder_1hr']:
+        triggers.append(timedelta(hours=-1))
+    if settings['reminder_30min']:
+        triggers.append(timedelta(minutes=-30))
+    if settings['reminder_10min']:
+        triggers.append(timedelta(minutes=-10))
+    if settings['reminder_1day'] and frequency.lower() in ['weekly', 'monthly']:
+        triggers.append(timedelta(days=-1))
+    return triggers if triggers else [timedelta(minutes=-10)]  # Default to 10 minutes if none selected
+
+
+def get_trigger_sets(settings):
+    """Resolve the reminder triggers once per run: frequency -> shared tuple of trigger offsets."""
+    return {frequency: tuple(get_reminder_triggers(frequency, settings)) for frequency in FREQUENCIES}
+
+
+class DayIndex:
+    """Available days of a period, indexed by date ordinal.
+
+    Which days are available repeats every week, so a day's position among
+    the available days, and the day at a position, are worked out from its
+    ordinal and the week's pattern: nothing is stored per day, and a
+    multi-year horizon costs no more memory than a month. Membership tests
+    and "next available day on or after" are O(1).
+    """
+
+    def __init__(self, start_date, end_date, schedule_weekdays, schedule_weekends):
+        self.start_date = start_date
+        self.first_ordinal = start_date.toordinal()
+        self.size = end_date.toordinal() - self.first_ordinal + 1
+        first_weekday = start_date.weekday()
+        # Offsets (0-6) into each week of the period, counted from start_date, that are available
+        self.week_offsets = tuple(
+            i for i in range(7)
+            if (schedule_weekdays if (first_weekday + i) % 7 < 5 else schedule_weekends))  # Monday=0, Sunday=6
+        # before[i] is how many of a week's available days have an offset below i
+        self.before = tuple(sum(1 for offset in self.week_offsets if offset < i) for i in range(8))
+        self.length = self.count_before(self.size)
+
+    def count_before(self, offset):
+        """Number of available days at offsets below offset."""
+        weeks, rest = divmod(offset, 7)
+        return weeks * len(self.week_offsets) + self.before[rest]
+
+    def offset(self, position):
+        """Offset from the period start of the available day at position."""
+        weeks, rest = divmod(position, len(self.week_offsets))
+        return weeks * 7 + self.week_offsets[rest]
+
+    def __contains__(self, day):
+        offset = day.toordinal() - self.first_ordinal
+        return 0 <= offset < self.size and offset % 7 in self.week_offsets
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("available day index out of range")
+        return self.start_date + timedelta(days=self.offset(index))
+
+    def __iter__(self):
+        return (self[position] for position in range(self.length))
+
+    def position(self, day):
+        """Index of the first available day on or after day (len(self) past the period end)."""
+        offset = max(day.toordinal() - self.first_ordinal, 0)
+        if offset >= self.size:
+            return self.length
+        return self.count_before(offset)
+
+    def next_available(self, day):
+        """Return midnight of the first available day on or after day, or None past the period end."""
+        position = self.position(day)
+        return self[position] if position < self.length else None
+
+
+def get_available_days(start_date, end_date, schedule_weekdays, schedule_weekends):
+    try:
+        return DayIndex(start_date, end_date, schedule_weekdays, schedule_weekends)
+    except Exception as e:
+        logging.error(f"Error getting available days: {str(e)}")
+        return []
+
+
+class SlotAllocator:
+    """Occupied active-hour slots on each available day of a period.
+
+    Every day offers the same slots: the preferred start time (clamped into
+    the active window) and then one slot per stagger interval, up to the
+    last one a chore of duration minutes still ends by active_end. A chore
+    takes the first free slot on its target day, or
+    spills to the next available day with room. Full days are skipped with a
+    path-compressed "next day with a free slot" pointer, so placement stays
+    O(log n) amortized however many chores have already spilled.
+    """
+
+    def __init__(self, available_days, first_slot, stagger_minutes, active_end, duration):
+        self.available_days = available_days
+        self.first_slot = first_slot
+        self.stagger_minutes = stagger_minutes
+        # With no stagger every chore on a day shares the first slot, so days never fill up
+        latest_start = active_end - duration
+        if latest_start < first_slot:
+            self.capacity = 0
+        elif stagger_minutes > 0:
+            self.capacity = (latest_start - first_slot) // stagger_minutes + 1
+        else:
+            self.capacity = None
+        # Only days that have been used are stored, so a long horizon costs nothing until chores spill into it
+        self.used = {}
+        self.next_free = {}
+
+    def _find(self, position):
+        root = position
+        while self.next_free.get(root, root) != root:
+            root = self.next_free[root]
+        while self.next_free.get(position, position) != root:
+            self.next_free[position], position = root, self.next_free[position]
+        return root
+
+    def place(self, day):
+        """Take the first free slot on or after day; return its start time, or None past the period end."""
+        position = self._find(self.available_days.position(day))
+        if position >= len(self.available_days) or self.capacity == 0:
+            return None
+        slot = self.used.get(position, 0)
+        self.used[position] = slot + 1
+        if self.capacity is not None and slot + 1 >= self.capacity:
+            self.next_free[position] = position + 1
+        return self.available_days[position] + timedelta(minutes=self.first_slot + slot * self.stagger_minutes)
+
+    def place_group(self, start_date, count, per, day_offsets):
+        """Place count chores in order, chore i targeting start_date + day_offsets[i // per] days."""
+        return [self.place(start_date + timedelta(days=day_offsets[i // per])) for i in range(count)]
+
+
+class PackingAllocator:
+    """Active-hour time on each available day, packed by chore duration.
+
+    Each day's window runs from the preferred start time to active_end and
+    is filled from the front, so chores never overlap; a chore's slot is its
+    duration rounded up to the stagger interval (back to back with no
+    stagger). Chores that target the same day are placed longest first
+    (first-fit decreasing), each on the first day at or after its target
+    with room left. A max tree over the days' remaining minutes finds that
+    day in O(log days), so placement stays near-linear in the chore count.
+    """
+
+    def __init__(self, available_days, first_slot, stagger_minutes, active_end):
+        self.available_days = available_days
+        self.first_slot = first_slot
+        self.stagger_minutes = stagger_minutes
+        self.window = active_end - first_slot
+        self.size = 1
+        while self.size < max(len(available_days), 1):
+            self.size *= 2
+        # Leaves hold each day's remaining minutes; inner nodes the max of their children. Nodes
+        # not yet touched hold the whole window and are not stored, so a long horizon costs nothing
+        # until chores reach it (leaves past the period end are never returned)
+        self.tree = {}
+
+    def _first_fit(self, position, minutes):
+        """First day position >= position with at least minutes left, or None."""
+        # Depth-first, left child first, skipping subtrees wholly before position or without room
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, low, high = stack.pop()
+            if high <= position or self.tree.get(node, self.window) < minutes:
+                continue
+            if node >= self.size:
+                return low if low < len(self.available_days) else None
+            middle = (low + high) // 2
+            stack.append((2 * node + 1, middle, high))
+            stack.append((2 * node, low, middle))
+        return None
+
+    def _take(self, position, minutes):
+        tree, window = self.tree, self.window
+        node = self.size + position
+        tree[node] = tree.get(node, window) - minutes
+        node //= 2
+        while node:
+            tree[node] = max(tree.get(2 * node, window), tree.get(2 * node + 1, window))
+            node //= 2
+
+    def place(self, day, duration=DEFAULT_DURATION_MINUTES):
+        """Pack a chore of duration minutes on or after day; return its start time, or None if nothing fits."""
+        position = self._first_fit(self.available_days.position(day), duration)
+        if position is None:
+            return None
+        remaining = self.tree.get(self.size + position, self.window)
+        slot = duration
+        if self.stagger_minutes > 0:
+            slot = -(-duration // self.stagger_minutes) * self.stagger_minutes
+        # The rounded-up slot may run past active_end; only the chore itself has to fit
+        self._take(position, min(slot, remaining))
+        return self.available_days[position] + timedelta(minutes=self.first_slot + self.window - remaining)
+
+    def place_group(self, start_date, count, per, day_offsets, durations):
+        """Place count chores, chore i targeting start_date + day_offsets[i // per] days; longest first per target."""
+        starts = [None] * count
+        for block in range(0, count, per):
+            target = start_date + timedelta(days=day_offsets[block // per])
+            order = sorted(range(block, min(block + per, count)), key=lambda i: -durations[i])
+            for i in order:
+                starts[i] = self.place(target, durations[i])
+        return starts
+
+
+def time_to_minutes(time_str):
+    hour, minute = time_str.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+def clamp_first_slot(time_of_day, active_start, active_end, duration):
+    """The preferred start (minutes), or active_start if a chore of duration minutes starting then would end after active_end."""
+    return time_of_day if active_start <= time_of_day <= active_end - duration else active_start
+
+
+class CompiledSettings:
+    """Validated, precomputed settings for one run; immutable once built.
+
+    Built by compile_settings from a settings dict (Tk variable snapshot or
+    csc_settings.json), so the scheduler never re-parses times or re-reads
+    flags, and can run on any thread.
+    """
+    __slots__ = ('period', 'start_date', 'end_date', 'active_start', 'active_end', 'time_of_day', 'first_slot',
+                 'stagger_minutes', 'schedule_weekdays', 'schedule_weekends', 'available_days',
+                 'reminder_days', 'trigger_sets', 'calendar_id', 'members', 'zone')
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledSettings is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledSettings is read-only")
+
+    def __repr__(self):
+        return f"CompiledSettings(period={self.period!r}, start_date={self.start_date:%Y-%m-%d}, end_date={self.end_date:%Y-%m-%d})"
+
+
+def compile_settings(settings, today=None):
+    """Validate a settings dict and precompute everything schedule_chores needs.
+
+    Raises SettingsError for the first invalid setting. The period is fixed
+    here (from today, default now), so a compiled snapshot always schedules
+    the same period.
+    """
+    start_date, end_date = get_period_bounds(settings['period'], today)
+    validate_settings(settings, start_date, end_date)
+
+    active_start = time_to_minutes(settings['active_start'])
+    active_end = time_to_minutes(settings['active_end'])
+    # Chores start at the preferred time, clamped into the active window so a chore still ends by active_end
+    # (packed chores are clamped by their own durations, see slot_layout)
+    time_of_day = time_to_minutes(settings['time_of_day'])
+    first_slot = clamp_first_slot(time_of_day, active_start, active_end, DEFAULT_DURATION_MINUTES)
+
+    schedule_weekdays = bool(settings['schedule_weekdays'])
+    schedule_weekends = bool(settings['schedule_weekends'])
+    # Get available days based on weekday/weekend selection
+    available_days = get_available_days(start_date, end_date, schedule_weekdays, schedule_weekends)
+    if not available_days:
+        logging.error("No available days in the selected period")
+        raise SettingsError("No available days in the selected period")
+    zone = get_calendar_zone(settings.get('timezone'), start_date, end_date)
+
+    return CompiledSettings(
+        period=settings['period'],
+        start_date=start_date,
+        end_date=end_date,
+        active_start=active_start,
+        active_end=active_end,
+        time_of_day=time_of_day,
+        first_slot=first_slot,
+        stagger_minutes=int(settings['stagger_interval']),
+        schedule_weekdays=schedule_weekdays,
+        schedule_weekends=schedule_weekends,
+        available_days=available_days,
+        reminder_days=int(settings['reminder_days']),
+        trigger_sets=get_trigger_sets(settings),
+        calendar_id=settings.get('calendar_id', ''),
+        members=tuple(parse_members(settings.get('members'))),
+        zone=zone,
+    )
+
+
+def slot_layout(settings, chores):
+    """The SlotLayout schedule_chores uses for chores (Chore rows) under CompiledSettings.
+
+    Any Duration switches to packing, and the preferred start is then
+    clamped so the longest chore still ends by active_end; otherwise chores
+    take hour-long stagger slots from settings.first_slot.
+    """
+    packing = False
+    longest = 0
+    for chore in chores:
+        if chore.duration:
+            packing = True
+        longest = max(longest, chore.duration or DEFAULT_DURATION_MINUTES)
+    if not packing:
+        return SlotLayout(False, settings.first_slot)
+    return SlotLayout(True, clamp_first_slot(settings.time_of_day, settings.active_start, settings.active_end, longest))
+
+
+class Schedule:
+    """The ScheduledEvents of one run, produced as they are iterated, plus the chores left out.
+
+    dropped counts the chores that found no free slot before the period end;
+    it is final once every event has been produced. layout is the SlotLayout
+    the chores were placed with (see csc_conflicts).
+    """
+    __slots__ = ('events', 'dropped', 'layout')
+
+    def __init__(self, events, layout):
+        self.events = events
+        self.dropped = 0
+        self.layout = layout
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.events)
+
+
+def get_calendar_zone(name, start_date, end_date):
+    """The csc_timezone.CalendarZone for the 'timezone' setting over the period, or None for floating times."""
+    name = (name or '').strip()
+    if not name:
+        return None
+    if not csc_timezone.AVAILABLE:
+        logging.error(f"Time zone {name} set but zoneinfo is not available")
+        raise SettingsError("Time zones need Python 3.9 or later (or the backports.zoneinfo package)")
+    try:
+        return csc_timezone.calendar_zone(name, start_date, end_date)
+    except (csc_timezone.ZoneInfoNotFoundError, ValueError) as e:
+        logging.error(f"Invalid time zone: {name} ({str(e)})")
+        raise SettingsError("Unknown time zone. Use an IANA name such as Europe/Berlin, or leave it empty for floating times")
+
+
+def schedule_chores(chores, settings, today=None, metrics=None, vectorized=None, frequencies=None):
+    """Validate settings and return a Schedule: an iterator of ScheduledEvents for the chore rows.
+
+    settings is a settings dict or a CompiledSettings (today is then ignored:
+    the period was fixed when it was compiled). Validation happens up front;
+    events are then produced one at a time as they are scheduled, so they can
+    be written out without being collected. Chores that find no slot in the
+    period are left out and counted in the Schedule's dropped.
+    metrics (a csc_metrics.RunMetrics) receives per-stage timings and counts.
+    vectorized picks the NumPy slot placement (same results, batched per
+    frequency); by default it is used when numpy is installed and the chore
+    list has at least VECTORIZE_THRESHOLD rows.
+    frequencies, if given, limits the events produced to those frequencies
+    (plus the re-import reminder). The other groups are still placed, as
+    later groups fill the slots they leave, so the events that are produced
+    are exactly those a full run would give.
+    With members configured, or chores with an Assignee, every chore event
+    gets an assignee (see csc_members); this needs all chore events at
+    once, so they are then collected before any is produced.
+    """
+    metrics = metrics or RunMetrics()
+    if not isinstance(settings, CompiledSettings):
+        with metrics.stage('period_setup'):
+            settings = compile_settings(settings, today)
+    start_date, end_date = settings.start_date, settings.end_date
+    available_days = settings.available_days
+
+    # Group chores by frequency
+    with metrics.stage('frequency_grouping') as stage:
+        if isinstance(chores, ChoreGroups):
+            # Already bucketed while the CSV was read
+            groups = chores.groups
+        else:
+            groups = {frequency: [] for frequency in FREQUENCIES}
+            for chore in chores:
+                group = groups.get(chore.frequency)
+                if group is not None:
+                    group.append(chore)
+        daily_chores, weekly_chores, monthly_chores = groups[DAILY], groups[WEEKLY], groups[MONTHLY]
+        stage.count = len(daily_chores) + len(weekly_chores) + len(monthly_chores)
+
+    # Any Duration in the CSV switches every group to packing by time used
+    layout = slot_layout(settings, itertools.chain.from_iterable(groups.values()))
+    packing, first_slot = layout
+    if vectorized is None:
+        vectorized = csc_vectorized.AVAILABLE and stage.count >= VECTORIZE_THRESHOLD
+    if packing:
+        slots = PackingAllocator(available_days, first_slot, settings.stagger_minutes, settings.active_end)
+    else:
+        # Both allocators give identical results, so a missing numpy just means the scalar path
+        allocator = csc_vectorized.VectorSlotAllocator if vectorized and csc_vectorized.AVAILABLE else SlotAllocator
+        slots = allocator(available_days, first_slot, settings.stagger_minutes, settings.active_end,
+                          DEFAULT_DURATION_MINUTES)
+
+    # Identical Room/Task/Frequency rows are told apart by their slot: the nth repeat of that row
+    calendar_id = settings.calendar_id
+    repeats = {}
+    trigger_sets = settings.trigger_sets
+
+    def chore_event(chore, event_start, rrule, frequency):
+        identity = (chore.room, chore.task, frequency)
+        slot = repeats[identity] = repeats.get(identity, -1) + 1
+        minutes = chore.duration or DEFAULT_DURATION_MINUTES
+        return ScheduledEvent(chore.summary, event_start, event_start + timedelta(minutes=minutes), rrule,
+                              trigger_sets[frequency], chore.alarm_description, frequency,
+                              chore_uid(calendar_id, *identity, str(slot)), (),
+                              Member(chore.assignee, None) if chore.assignee else None)
+
+    def wanted(frequency):
+        return frequencies is None or frequency in frequencies
+
+    def place_group(group, frequency, per, day_offsets):
+        if packing:
+            durations = [chore.duration or DEFAULT_DURATION_MINUTES for chore in group]
+            starts = slots.place_group(start_date, len(group), per, day_offsets, durations)
+        else:
+            starts = slots.place_group(start_date, len(group), per, day_offsets)
+        dropped = starts.count(None)
+        if dropped:
+            logging.warning(f"No free slot left in the period for {dropped} {frequency} chores")
+            schedule.dropped += dropped
+        return starts
+
+    # Process Monthly Chores (first available day)
+    def monthly_events():
+        rrule = {'FREQ': 'MONTHLY', 'UNTIL': end_date}
+        starts = place_group(monthly_chores, MONTHLY, max(len(monthly_chores), 1), [0])
+        if not wanted(MONTHLY):
+            return
+        for chore, event_start in zip(monthly_chores, starts):
+            if event_start is not None:
+                yield chore_event(chore, event_start, rrule, MONTHLY)
+
+    # Process Weekly Chores (spread across weeks in a month)
+    def weekly_events():
+        if not weekly_chores:
+            return
+        # Spread over the period's weeks, but at most a year's: on a multi-year horizon the
+        # chores given later weeks would otherwise not start for years
+        weeks_in_period = max(ceil(min((end_date - start_date).days, 365) / 7), 1)
+        chores_per_week = ceil(len(weekly_chores) / weeks_in_period)
+        week_offsets = [week * 7 for week in range(ceil(len(weekly_chores) / chores_per_week))]
+        rrule = {'FREQ': 'WEEKLY', 'UNTIL': end_date, 'INTERVAL': 4}
+        starts = place_group(weekly_chores, WEEKLY, chores_per_week, week_offsets)
+        if not wanted(WEEKLY):
+            return
+        for chore, event_start in zip(weekly_chores, starts):
+            if event_start is not None:
+                yield chore_event(chore, event_start, rrule, WEEKLY)
+
+    # Process Daily Chores (spread across the available days of the first week)
+    def daily_events():
+        if not daily_chores:
+            return
+        first_week = available_days[:available_days.position(start_date + timedelta(days=7))]
+        chores_per_day = ceil(len(daily_chores) / len(first_week))
+        day_offsets = [(day - start_date).days for day in first_week]
+        rrule = {'FREQ': 'WEEKLY', 'UNTIL': end_date, 'INTERVAL': 1}
+        starts = place_group(daily_chores, DAILY, chores_per_day, day_offsets)
+        if not wanted(DAILY):
+            return
+        for chore, event_start in zip(daily_chores, starts):
+            if event_start is not None:
+                yield chore_event(chore, event_start, rrule, DAILY)
+
+    # Add re-import reminder
+    def reimport_events():
+        reimport_date = end_date - timedelta(days=settings.reminder_days)
+        if reimport_date not in available_days:
+            reimport_date = available_days[-1]  # Use last available day if needed
+        reimport_date = slots.place(reimport_date) or reimport_date + timedelta(minutes=first_slot)
+
+        yield ScheduledEvent('Reminder: Re-import Chore Calendar', reimport_date, reimport_date + timedelta(hours=1), None,
+                             trigger_sets[DAILY], 'Reminder: Time to re-import your chore calendar', DAILY,
+                             chore_uid(calendar_id, 'reimport'), ())
+
+    def generate_events():
+        # Slots are filled in one pass: monthly chores first, then weekly, then daily
+        # chores take whatever is left on their days.
+        chore_events = itertools.chain(metrics.timed('monthly_scheduling', monthly_events()),
+                                       metrics.timed('weekly_scheduling', weekly_events()),
+                                       metrics.timed('daily_scheduling', daily_events()))
+        if settings.members or any(chore.assignee for group in groups.values() for chore in group):
+            chore_events = list(chore_events)
+            with metrics.stage('member_assignment') as stage:
+                chore_events = assign_members(chore_events, settings.members)
+                stage.count = len(chore_events)
+        yield from chore_events
+        yield from metrics.timed('reimport_reminder', reimport_events())
+
+    schedule = Schedule(generate_events(), layout)
+    return schedule
+
+
+def write_calendar(events, stream, previous=None, metrics=None, progress=None, zone=None):
+    """Stream events to a binary stream as ICS; returns the ICSWriter for its counters.
+
+    previous maps UID -> (DTSTAMP, raw VEVENT bytes) from an earlier calendar
+    (see csc_ics.read_previous_events). Events whose content is unchanged are
+    copied from it byte for byte; only changed or new events get a new DTSTAMP.
+    Rendering and stream writes are reported to metrics as 'serialization'
+    and 'file_write'; time spent scheduling inside the events iterator is not.
+    progress, if given, is called as progress(events, bytes_written) every
+    PROGRESS_INTERVAL events and once at the end; it may raise
+    GenerationCancelled to abort the run.
+    zone (CompiledSettings.zone) writes event times in that time zone, with
+    its VTIMEZONE; without it they are floating local times.
+    """
+    writer = ICSWriter(stream, zone)
+    writer.write_header()
+    dtstamp = utc_now()
+    count = 0
+    for scheduled in events:
+        if progress is not None and count % PROGRESS_INTERVAL == 0:
+            progress(count, writer.bytes_written)
+        count += 1
+        if previous and scheduled.uid in previous:
+            old_dtstamp, old_block = previous[scheduled.uid]
+            if writer.render_event(scheduled, scheduled.uid, old_dtstamp) == old_block:
+                writer.write_block(old_block)
+                writer.events_unchanged += 1
+                continue
+        writer.write_event(scheduled, scheduled.uid, dtstamp)
+    writer.write_footer()
+    if progress is not None:
+        progress(count, writer.bytes_written)
+    if metrics is not None:
+        metrics.add('serialization', writer.render_seconds, writer.events_written + writer.events_unchanged)
+        metrics.add('file_write', writer.write_seconds, writer.bytes_written)
+    return writer
+
+
+def generate_ics(chores, settings, today=None, metrics=None, progress=None):
+    """Schedule the chores; return the serialized calendar as bytes and the number of chores left out."""
+    if not isinstance(settings, CompiledSettings):
+        with (metrics or RunMetrics()).stage('period_setup'):
+            settings = compile_settings(settings, today)
+    buffer = io.BytesIO()
+    schedule = schedule_chores(chores, settings, metrics=metrics)
+    write_calendar(schedule, buffer, metrics=metrics, progress=progress, zone=settings.zone)
+    return buffer.getvalue(), schedule.dropped
+
+
+def write_ics(data, output_file, metrics=None):
+    with (metrics or RunMetrics()).stage('file_write') as stage:
+        with open(output_file, 'wb') as f:
+            f.write(data)
+        stage.count = len(data)
+    logging.info(f"ICS file generated: {output_file}")
@@ -0,0 +1,288 @@
+"""Streaming ICS output for ChoreSynCal.
+
+ICSWriter writes the VCALENDAR header, then each VEVENT (with its VALARMs)
+as soon as it is scheduled, so memory stays flat however many chores a
+calendar holds. Any binary stream works: a file, sys.stdout.buffer or a
+socket's makefile('wb'). read_previous_events reads back an earlier
+calendar so unchanged events can be copied through verbatim, and
+iter_events parses any calendar's VEVENTs in one streaming pass.
+"""
+import codecs
+import socket
+import sys
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+PRODID = '-//ChoreSynCal Calendar Generator//xAI//EN'
+LINE_LIMIT = 75  # octets per content line, excluding CRLF (RFC 5545 section 3.1)
+
+# One parsed VEVENT: line is where its BEGIN:VEVENT is, properties and each
+# alarm are lists of (name, value) pairs in file order. name keeps any
+# parameters (e.g. 'DTSTART;TZID=Europe/Berlin'); values are left escaped.
+ParsedEvent = namedtuple('ParsedEvent', ['line', 'properties', 'alarms'])
+
+
+def fold_line(line):
+    """Fold a content line to at most 75 octets per physical line (RFC 5545 section 3.1).
+
+    Splits only between characters, so multi-byte UTF-8 sequences stay whole,
+    and never right after a backslash so escapes are not split.
+    """
+    if len(line.encode('utf-8')) <= LINE_LIMIT:
+        return line
+    parts = []
+    current = []
+    byte_count = 0
+    limit = LINE_LIMIT
+    for char in line:
+        char_len = len(char.encode('utf-8'))
+        if current and byte_count + char_len > limit:
+            carry = current.pop() if len(current) > 1 and current[-1] == '\\' else None
+            parts.append(''.join(current))
+            current = [carry] if carry else []
+            byte_count = 1 if carry else 0
+            limit = LINE_LIMIT - 1  # continuation lines start with a space
+        current.append(char)
+        byte_count += char_len
+    parts.append(''.join(current))
+    return '\r\n '.join(parts)
+
+
+def escape_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def format_datetime(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def format_duration(delta):
+    # Trigger offsets are whole days, hours or minutes before the event
+    sign = '-' if delta.total_seconds() < 0 else ''
+    seconds = abs(int(delta.total_seconds()))
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    value = f"{sign}P"
+    if days:
+        value += f"{days}D"
+    if hours or minutes or seconds or not days:
+        value += 'T'
+        if hours:
+            value += f"{hours}H"
+        if minutes:
+            value += f"{minutes}M"
+        if seconds or not (hours or minutes):
+            value += f"{seconds}S"
+    return value
+
+
+def format_common_name(name):
+    """CN parameter for a name; quoted when it holds characters that end a parameter (RFC 5545 section 3.2)."""
+    name = name.replace('"', "'")
+    if any(char in name for char in ';:,'):
+        return f'CN="{name}"'
+    return f'CN={name}'
+
+
+def format_rrule(rrule, zone=None):
+    """RRULE value; with a zone (csc_timezone.CalendarZone), UNTIL is converted to UTC as RFC 5545 requires."""
+    parts = []
+    for key, value in rrule.items():
+        if hasattr(value, 'strftime'):
+            value = format_datetime(zone.to_utc(value)) + 'Z' if zone is not None else format_datetime(value)
+        parts.append(f"{key}={value}")
+    return ';'.join(parts)
+
+
+ALARM_HEAD = b'BEGIN:VALARM\r\nACTION:DISPLAY\r\n'
+
+
+def alarm_template(triggers):
+    """Pre-serialize the part of each VALARM after its DESCRIPTION line for a trigger set."""
+    return [f'TRIGGER:{format_duration(trigger)}\r\nEND:VALARM\r\n'.encode('utf-8') for trigger in triggers]
+
+
+class ICSWriter:
+    """Write a calendar one event at a time to a binary stream.
+
+    zone, a csc_timezone.CalendarZone, makes event times TZID-qualified and
+    adds its VTIMEZONE to the header; without it times are floating.
+    """
+
+    def __init__(self, stream, zone=None):
+        self.stream = stream
+        self.zone = zone
+        # Property names for event times, with the TZID parameter when there is a zone
+        parameter = f';TZID={zone.tzid}' if zone is not None else ''
+        self.dtstart_name, self.dtend_name, self.exdate_name = (
+            name + parameter for name in ('DTSTART', 'DTEND', 'EXDATE'))
+        self.events_written = 0
+        self.events_unchanged = 0
+        self.bytes_written = 0
+        self.render_seconds = 0.0
+        self.write_seconds = 0.0
+        # Trigger sets are shared per frequency, so each is serialized once per run
+        self.alarm_templates = {}
+
+    def _render_lines(self, lines):
+        return ''.join(fold_line(line) + '\r\n' for line in lines).encode('utf-8')
+
+    def _write_lines(self, lines):
+        self.write_block(self._render_lines(lines))
+
+    def write_block(self, data):
+        started = time.perf_counter()
+        self.stream.write(data)
+        self.write_seconds += time.perf_counter() - started
+        self.bytes_written += len(data)
+
+    def render_header(self):
+        """The calendar's opening lines, with the VTIMEZONE if there is a zone, as bytes."""
+        header = self._render_lines(['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}'])
+        return header + self.zone.vtimezone if self.zone is not None else header
+
+    def write_header(self):
+        self.write_block(self.render_header())
+
+    def render_event(self, scheduled, uid, dtstamp):
+        """Return the VEVENT block for scheduled as bytes; dtstamp may be a datetime or a raw DTSTAMP value."""
+        if hasattr(dtstamp, 'strftime'):
+            dtstamp = format_datetime(dtstamp) + 'Z'
+        # Property order matches icalendar's canonical VEVENT order
+        lines = [
+            'BEGIN:VEVENT',
+            f'SUMMARY:{escape_text(scheduled.summary)}',
+            f'{self.dtstart_name}:{format_datetime(scheduled.start)}',
+            f'{self.dtend_name}:{format_datetime(scheduled.end)}',
+            f'DTSTAMP:{dtstamp}',
+            f'UID:{uid}',
+        ]
+        if scheduled.rrule is not None:
+            lines.append(f'RRULE:{format_rrule(scheduled.rrule, self.zone)}')
+        if scheduled.exdates:
+            lines.append(f"{self.exdate_name}:{','.join(format_datetime(exdate) for exdate in scheduled.exdates)}")
+        if scheduled.assignee is not None and scheduled.assignee.email:
+            lines.append(f'ATTENDEE;{format_common_name(scheduled.assignee.name)}:mailto:{scheduled.assignee.email}')
+        template = self.alarm_templates.get(scheduled.triggers)
+        if template is None:
+            template = self.alarm_templates[scheduled.triggers] = alarm_template(scheduled.triggers)
+        # Only the DESCRIPTION line differs between events
+        description = (fold_line(f'DESCRIPTION:{escape_text(scheduled.alarm_description)}') + '\r\n').encode('utf-8')
+        alarms = b''.join(ALARM_HEAD + description + tail for tail in template)
+        return self._render_lines(lines) + alarms + b'END:VEVENT\r\n'
+
+    def write_event(self, scheduled, uid, dtstamp):
+        started = time.perf_counter()
+        block = self.render_event(scheduled, uid, dtstamp)
+        self.render_seconds += time.perf_counter() - started
+        self.write_block(block)
+        self.events_written += 1
+
+    def write_footer(self):
+        self._write_lines(['END:VCALENDAR'])
+        self.stream.flush()
+
+
+def read_previous_events(stream):
+    """Map UID -> (DTSTAMP value, raw VEVENT bytes) for each event in an ICS byte stream.
+
+    Reads line by line and keeps the exact bytes of each VEVENT (folding and
+    CRLFs included), so unchanged events can be written back verbatim.
+    """
+    events = {}
+    block = None
+    uid = dtstamp = None
+    for line in stream:
+        if block is None:
+            if line.rstrip(b'\r\n') == b'BEGIN:VEVENT':
+                block, uid, dtstamp = [line], None, None
+            continue
+        block.append(line)
+        if line.startswith(b'UID:'):
+            uid = line[4:].rstrip(b'\r\n').decode('utf-8')
+        elif line.startswith(b'DTSTAMP:'):
+            dtstamp = line[8:].rstrip(b'\r\n').decode('utf-8')
+        elif line.rstrip(b'\r\n') == b'END:VEVENT':
+            if uid is not None:
+                events[uid] = (dtstamp, b''.join(block))
+            block = None
+    return events
+
+
+def iter_event_blocks(stream, chunk_size=1 << 20):
+    """Yield (line number, unfolded VEVENT text) for each event in an ICS byte stream.
+
+    The stream is read and decoded a chunk at a time and events are found
+    with str.find, so there is no per-line Python work and only about one
+    chunk is held at a time. Line endings in the text are normalized to LF.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    number = 1  # line number at the start of text
+    text = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        text += decoder.decode(chunk, final=not chunk)
+        position = 0  # end of the last complete event in text
+        while True:
+            # Searching for whole lines (after a newline) never matches inside a folded value
+            start = text.find('\nBEGIN:VEVENT', position)
+            end = text.find('\nEND:VEVENT', start + 1) if start >= 0 else -1
+            if end < 0:
+                break
+            number += text.count('\n', position, start + 1)
+            end += len('\nEND:VEVENT')
+            block = text[start + 1:end]
+            if '\r' in block:
+                block = block.replace('\r\n', '\n')
+            yield number, block.replace('\n ', '').replace('\n\t', '')
+            number += block.count('\n')
+            position = end
+        # Whatever follows the last complete event is finished by the next chunk
+        text = text[position:]
+        if not chunk:
+            break
+
+
+def parse_event(number, block):
+    """Parse an unfolded VEVENT (from iter_event_blocks) into a ParsedEvent."""
+    event = ParsedEvent(number, [], [])
+    alarm = None
+    for line in block.split('\n'):
+        if line == 'BEGIN:VALARM':
+            alarm = []
+        elif line == 'END:VALARM':
+            event.alarms.append(alarm)
+            alarm = None
+        elif line and line not in ('BEGIN:VEVENT', 'END:VEVENT'):
+            name, _, value = line.partition(':')
+            (alarm if alarm is not None else event.properties).append((name, value))
+    return event
+
+
+def iter_events(stream):
+    """Parse the VEVENTs of an ICS byte stream one at a time, without loading the whole calendar."""
+    for number, block in iter_event_blocks(stream):
+        yield parse_event(number, block)
+
+
+def open_output(target):
+    """Open '-' (stdout), 'tcp://host:port' or a file path for binary writing.
+
+    Returns (stream, close) where close() releases whatever was opened.
+    """
+    if target == '-':
+        return sys.stdout.buffer, sys.stdout.buffer.flush
+    if target.startswith('tcp://'):
+        address = urlparse(target)
+        connection = socket.create_connection((address.hostname, address.port))
+        stream = connection.makefile('wb')
+
+        def close():
+            stream.close()
+            connection.close()
+        return stream, close
+    stream = open(target, 'wb')
+    return stream, stream.close
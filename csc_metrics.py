@@ -0,0 +1,116 @@
+"""Per-stage timing records and opt-in profiling for ChoreSynCal runs.
+
+RunMetrics collects wall time and item counts per pipeline stage and writes
+them to the log as one JSON record per stage, e.g.
+
+    {"event": "stage", "run": "smiths", "stage": "csv_read", "seconds": 0.0021, "count": 41}
+
+followed by a {"event": "run", ...} total. profile_run optionally wraps a
+whole run in cProfile or tracemalloc and saves the result next to the log.
+"""
+import cProfile
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILERS = ('cprofile', 'tracemalloc')
+
+
+class RunMetrics:
+    def __init__(self, run=''):
+        self.run = run
+        self.stages = {}  # stage -> [seconds, count], in the order stages first ran
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds, count=0):
+        totals = self.stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += count
+
+    @contextmanager
+    def stage(self, stage):
+        """Time the enclosed block; set .count on the yielded record to report how many items it handled."""
+        record = StageRecord()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.add(stage, time.perf_counter() - started, record.count)
+
+    def timed(self, stage, events):
+        """Yield from events, charging only the time spent producing them (not the consumer's) to stage."""
+        iterator = iter(events)
+        seconds = 0.0
+        count = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                event = next(iterator)
+            except StopIteration:
+                seconds += time.perf_counter() - started
+                break
+            seconds += time.perf_counter() - started
+            count += 1
+            yield event
+        self.add(stage, seconds, count)
+
+    def records(self):
+        for stage, (seconds, count) in self.stages.items():
+            yield {'event': 'stage', 'run': self.run, 'stage': stage, 'seconds': round(seconds, 6), 'count': count}
+        yield {'event': 'run', 'run': self.run, 'seconds': round(time.perf_counter() - self.started, 6)}
+
+    def log(self):
+        for record in self.records():
+            logging.info(json.dumps(record))
+
+
+class StageRecord:
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+
+@contextmanager
+def profile_run(kind, directory='.', run=''):
+    """Profile the enclosed run with 'cprofile' or 'tracemalloc' (None disables) and save it to directory.
+
+    cProfile output is a .prof file for pstats/snakeviz; tracemalloc output
+    is a snapshot file for tracemalloc.Snapshot.load.
+    """
+    if kind is None:
+        yield
+        return
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    name = f"csc-{run + '-' if run else ''}{stamp}"
+    os.makedirs(directory, exist_ok=True)
+    if kind == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = os.path.join(directory, name + '.prof')
+            profiler.dump_stats(path)
+            logging.info(json.dumps({'event': 'profile', 'run': run, 'kind': kind, 'path': path}))
+    elif kind == 'tracemalloc':
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if not already_tracing:
+                tracemalloc.stop()
+            path = os.path.join(directory, name + '.tracemalloc')
+            snapshot.dump(path)
+            logging.info(json.dumps({'event': 'profile', 'run': run, 'kind': kind, 'path': path, 'peak_bytes': peak}))
+    else:
+        raise ValueError(f"Unknown profiler: {kind}")
@@ -0,0 +1,127 @@
+"""Schedule preview window for the ChoreSynCal GUI.
+
+The preview lists a calendar's occurrences by month and week in a
+ttk.Treeview that is filled lazily: months are inserted up front with their
+totals, a month's weeks when it is opened and a week's occurrences when
+that week is opened, each read as one indexed range from the occurrence
+cache (csc_cache). Closing a node drops its rows again, so the tree only
+ever holds what has been expanded and a Year calendar opens instantly.
+"""
+import logging
+import threading
+import tkinter as tk
+from datetime import timedelta
+from tkinter import ttk
+
+import csc_cache
+
+# Placeholder child that gives an unopened node its expand arrow
+PLACEHOLDER = 'placeholder'
+
+
+def month_weeks(day_counts):
+    """Group {day: occurrence count} into {month start: {week start: count}}, in date order.
+
+    Weeks start on Monday and are split at month boundaries, so each week
+    node covers only days of its own month.
+    """
+    months = {}
+    for day in sorted(day_counts):
+        month = day.replace(day=1)
+        week = max(day - timedelta(days=day.weekday()), month)
+        weeks = months.setdefault(month, {})
+        weeks[week] = weeks.get(week, 0) + day_counts[day]
+    return months
+
+
+class PreviewWorker(threading.Thread):
+    """Look up (or schedule and cache) the calendar for a settings snapshot off the Tk thread."""
+
+    def __init__(self, csv_file, settings):
+        super().__init__(daemon=True)
+        self.csv_file = csv_file
+        self.settings = settings
+        self.done = threading.Event()
+        self.calendar_id = None
+        self.error = None
+
+    def run(self):
+        # SQLite connections belong to the thread that opened them
+        cache = csc_cache.OccurrenceCache()
+        try:
+            self.calendar_id = csc_cache.cached_calendar(cache, self.csv_file, self.settings)
+        except Exception as e:
+            self.error = e
+        finally:
+            cache.close()
+            self.done.set()
+
+
+class SchedulePreview(tk.Toplevel):
+    """Month/week tree of a cached calendar's occurrences."""
+
+    def __init__(self, master, calendar_id):
+        super().__init__(master)
+        self.title("ChoreSynCal - Schedule Preview")
+        self.geometry("640x480")
+        self.cache = csc_cache.OccurrenceCache()
+        self.calendar_id = calendar_id
+        self.period_start, self.period_end = self.cache.period(calendar_id)
+        self.weeks = month_weeks(self.cache.count_by_day(calendar_id))
+        # Item id -> (first day, day after the last) of the month or week it shows
+        self.ranges = {}
+
+        self.tree = ttk.Treeview(self, columns=('time', 'frequency'), selectmode='browse')
+        self.tree.heading('#0', text="Date / Chore")
+        self.tree.heading('time', text="Time")
+        self.tree.heading('frequency', text="Frequency")
+        self.tree.column('#0', width=380)
+        self.tree.column('time', width=110, anchor=tk.CENTER)
+        self.tree.column('frequency', width=90, anchor=tk.CENTER)
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind('<<TreeviewOpen>>', self.on_open)
+        self.tree.bind('<<TreeviewClose>>', self.on_close)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        for month, weeks in self.weeks.items():
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            self.add_node('', f"{month:%B %Y}", sum(weeks.values()), month, next_month)
+        logging.info(f"Schedule preview opened: {len(self.weeks)} months from {self.period_start:%Y-%m-%d}")
+
+    def add_node(self, parent, label, count, first, end):
+        item = self.tree.insert(parent, tk.END, text=f"{label}  ({count} chores)")
+        self.tree.insert(item, tk.END, iid=f"{item}.{PLACEHOLDER}")
+        self.ranges[item] = (first, end)
+
+    def on_open(self, event):
+        item = self.tree.focus()
+        if item not in self.ranges or not self.tree.exists(f"{item}.{PLACEHOLDER}"):
+            return
+        self.tree.delete(f"{item}.{PLACEHOLDER}")
+        first, end = self.ranges[item]
+        if self.tree.parent(item) == '':
+            # A month: its weeks, each ending at the next Monday or the month's end
+            for week, count in self.weeks[first].items():
+                week_end = min(week + timedelta(days=7 - week.weekday()), end)
+                self.add_node(item, f"Week of {week:%a %d %b}", count, week, week_end)
+            return
+        for occurrence in self.cache.query(self.calendar_id, first, end):
+            self.tree.insert(item, tk.END, text=f"{occurrence.start:%a %d %b}  {occurrence.summary}",
+                             values=(f"{occurrence.start:%H:%M}-{occurrence.end:%H:%M}", occurrence.frequency))
+
+    def on_close(self, event):
+        # Drop the rows again so only expanded nodes hold any
+        item = self.tree.focus()
+        if item not in self.ranges:
+            return
+        for child in self.tree.get_children(item):
+            self.ranges.pop(child, None)
+        self.tree.delete(*self.tree.get_children(item))
+        self.tree.insert(item, tk.END, iid=f"{item}.{PLACEHOLDER}")
+
+    def close(self):
+        self.cache.close()
+        self.destroy()
@@ -0,0 +1,227 @@
+"""Webcal subscription server: each household's calendar at a stable URL.
+
+Households come from the same manifest or directory as `batch` and are
+served at /<name>.ics, so calendar apps can subscribe to
+webcal://host:port/<name>.ics instead of importing files. Rendered calendars
+are kept in memory, plain and gzipped, in an LRU bounded by total bytes; a
+calendar is only regenerated when its CSV or settings file changes (or the
+day rolls over, as periods start today), and then in a worker thread so
+other clients keep being served. Clients poll often, so the common request
+is a cache hit answered 304 from the ETag alone.
+"""
+import asyncio
+import gzip
+import hashlib
+import io
+import logging
+import os
+import time
+from collections import OrderedDict, namedtuple
+from datetime import date
+from urllib.parse import unquote, urlparse
+
+import csc_engine
+from csc_ics import read_previous_events
+from csc_metrics import RunMetrics
+
+DEFAULT_PORT = 8080
+DEFAULT_CACHE_BYTES = 64 << 20
+# How long a cached calendar is served before its files are checked for changes again
+CHECK_INTERVAL_SECONDS = 2.0
+MAX_HEADER_BYTES = 16 << 10
+KEEP_ALIVE_SECONDS = 30
+
+RenderedCalendar = namedtuple('RenderedCalendar', ['fingerprint', 'etag', 'data', 'gzipped'])
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def file_fingerprint(path):
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def job_fingerprint(job):
+    """Changes whenever the calendar generated for job could change."""
+    return file_fingerprint(job.csv_file), file_fingerprint(job.settings_file), date.today()
+
+
+def render_household(job, previous=None):
+    """Generate job's calendar as bytes; events unchanged since previous (bytes) are copied verbatim."""
+    metrics = RunMetrics(run=job.name)
+    settings = csc_engine.load_settings(job.settings_file) if job.settings_file else dict(csc_engine.DEFAULT_SETTINGS)
+    settings.setdefault('calendar_id', job.name)
+    compiled = csc_engine.compile_settings(settings)
+    chores = csc_engine.read_chores(job.csv_file)
+    buffer = io.BytesIO()
+    # Keeping unchanged events' DTSTAMPs keeps the bytes, and so the ETag, stable
+    previous_events = read_previous_events(io.BytesIO(previous)) if previous else None
+    csc_engine.write_calendar(csc_engine.schedule_chores(chores, compiled, metrics=metrics), buffer, previous_events,
+                              metrics, zone=compiled.zone)
+    metrics.log()
+    return buffer.getvalue()
+
+
+def etag_matches(etag, if_none_match):
+    """Whether an If-None-Match header value matches etag (weak comparison, as RFC 9110 asks for here)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or (tag[2:] if tag.startswith('W/') else tag) == etag:
+            return True
+    return False
+
+
+class CalendarCache:
+    """LRU of RenderedCalendars by household name, bounded by the bytes held."""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, name):
+        entry = self.entries.get(name)
+        if entry is not None:
+            self.entries.move_to_end(name)
+        return entry
+
+    def put(self, name, entry):
+        self.discard(name)
+        entry_size = len(entry.data) + len(entry.gzipped)
+        if entry_size > self.max_bytes:
+            return
+        self.entries[name] = entry
+        self.size += entry_size
+        while self.size > self.max_bytes:
+            _, oldest = self.entries.popitem(last=False)
+            self.size -= len(oldest.data) + len(oldest.gzipped)
+
+    def discard(self, name):
+        old = self.entries.pop(name, None)
+        if old is not None:
+            self.size -= len(old.data) + len(old.gzipped)
+
+
+class WebcalServer:
+    def __init__(self, jobs, cache_bytes=DEFAULT_CACHE_BYTES):
+        self.jobs = {job.name: job for job in jobs}
+        self.cache = CalendarCache(cache_bytes)
+        self.checked = {}  # name -> monotonic time its files were last checked
+        self.pending = {}  # name -> Future of a running regeneration
+        self.hits = self.renders = 0
+
+    async def calendar(self, name):
+        """The current RenderedCalendar for a household, regenerating it only if its inputs changed."""
+        job = self.jobs[name]
+        entry = self.cache.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self.checked.get(name, 0) < CHECK_INTERVAL_SECONDS:
+            self.hits += 1
+            return entry
+        fingerprint = job_fingerprint(job)
+        self.checked[name] = now
+        if entry is not None and entry.fingerprint == fingerprint:
+            self.hits += 1
+            return entry
+        # Concurrent requests for a stale calendar share one regeneration
+        pending = self.pending.get(name)
+        if pending is None:
+            pending = self.pending[name] = asyncio.ensure_future(self.regenerate(job, fingerprint, entry))
+            pending.add_done_callback(lambda _: self.pending.pop(name, None))
+        return await asyncio.shield(pending)
+
+    async def regenerate(self, job, fingerprint, old):
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, render_household, job, old.data if old else None)
+        gzipped = await loop.run_in_executor(None, gzip.compress, data, 6)
+        entry = RenderedCalendar(fingerprint, f'"{hashlib.sha256(data).hexdigest()[:32]}"', data, gzipped)
+        self.cache.put(job.name, entry)
+        self.renders += 1
+        logging.info(f"Webcal calendar {job.name} rendered: {len(data)} bytes, {len(gzipped)} gzipped")
+        return entry
+
+    async def respond(self, method, target, headers):
+        """(status, extra headers, body) for one request."""
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        name = unquote(urlparse(target).path).strip('/')
+        if name.endswith('.ics'):
+            name = name[:-len('.ics')]
+        if name not in self.jobs:
+            return 404, {}, b''
+        try:
+            entry = await self.calendar(name)
+        except Exception as e:
+            logging.error(f"Webcal calendar {name} failed: {str(e)}")
+            return 500, {}, b''
+        response_headers = {'ETag': entry.etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+        if etag_matches(entry.etag, headers.get('if-none-match')):
+            return 304, response_headers, b''
+        response_headers['Content-Type'] = 'text/calendar; charset=utf-8'
+        if 'gzip' in headers.get('accept-encoding', ''):
+            response_headers['Content-Encoding'] = 'gzip'
+            return 200, response_headers, entry.gzipped
+        return 200, response_headers, entry.data
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, 400, {'Connection': 'close'}, b'', False)
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split()
+                if len(parts) != 3:
+                    await self.send(writer, 400, {'Connection': 'close'}, b'', False)
+                    return
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    key, _, value = line.partition(':')
+                    if key:
+                        headers[key.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                status, response_headers, body = await self.respond(method, target, headers)
+                if not keep_alive:
+                    response_headers['Connection'] = 'close'
+                await self.send(writer, status, response_headers, body, method == 'HEAD')
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, headers, body, head_only):
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if not head_only:
+            writer.write(body)
+        await writer.drain()
+
+    async def serve(self, host, port):
+        # Headers past MAX_HEADER_BYTES raise LimitOverrunError and get a 400
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        addresses = ', '.join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        logging.info(f"Webcal server serving {len(self.jobs)} calendars on {addresses}")
+        async with server:
+            await server.serve_forever()
+
+
+def run_server(jobs, host='127.0.0.1', port=DEFAULT_PORT, cache_bytes=DEFAULT_CACHE_BYTES):
+    """Serve the households of jobs (see csc_batch.load_jobs) until interrupted."""
+    if not jobs:
+        raise csc_engine.ChoreSynCalError("No households to serve")
+    try:
+        asyncio.run(WebcalServer(jobs, cache_bytes).serve(host, port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,147 @@
+"""Time zones for generated calendars: TZID-qualified times and their VTIMEZONE.
+
+Without the 'timezone' setting, event times are floating: each calendar app
+shows them at the same wall-clock time in whatever zone it is in. With an
+IANA name such as 'Europe/Berlin', they are that zone's wall-clock times,
+written as DTSTART;TZID=Europe/Berlin:..., and the calendar carries one
+VTIMEZONE defining the zone's offsets over the period, so a chore at 09:00
+stays at 09:00 across DST changes and is placed correctly for people in
+other zones.
+
+Zone lookups are memoized, and a zone's UTC offset changes over a period
+are found once per (zone, period) and cached with the rendered VTIMEZONE,
+so a calendar of thousands of events, or a batch of households sharing a
+few zones, resolves each zone once; per event only the TZID prefix is
+written. The RRULE UNTIL, which has to be UTC alongside a TZID, is
+converted from those cached transitions.
+
+zoneinfo is part of the standard library from Python 3.9 (backports.zoneinfo
+before that); without it, AVAILABLE is False and only floating times work.
+"""
+import bisect
+import functools
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    AVAILABLE = True
+except ImportError:
+    try:
+        from backports.zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+        AVAILABLE = True
+    except ImportError:
+        ZoneInfo = None
+        ZoneInfoNotFoundError = KeyError
+        AVAILABLE = False
+
+# How far before the period start to look for the transition that began the offset in effect
+LOOKBACK_DAYS = 366
+# Offset changes are found by checking the offset once per this step, then bisecting to the second
+SCAN_STEP = timedelta(days=1)
+
+# One change of UTC offset: local_start is the wall-clock time it happens at, in the old offset
+# (a VTIMEZONE observance's DTSTART); offsets are timedeltas; dst is whether the new offset is daylight time
+Transition = namedtuple('Transition', ['local_start', 'utc', 'offset_from', 'offset_to', 'name', 'dst'])
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(name):
+    """The ZoneInfo for an IANA name; raises ZoneInfoNotFoundError (a KeyError) or ValueError for bad names."""
+    if not AVAILABLE:
+        raise ZoneInfoNotFoundError("time zones need Python 3.9+ (zoneinfo) or backports.zoneinfo")
+    return ZoneInfo(name)
+
+
+def utc_now():
+    """The current time in UTC, for DTSTAMP."""
+    return datetime.now(timezone.utc)
+
+
+def format_offset(offset):
+    """A UTC offset as +HHMM (+HHMMSS when it has seconds), as TZOFFSETFROM/TZOFFSETTO want."""
+    sign = '-' if offset < timedelta(0) else '+'
+    minutes, seconds = divmod(abs(int(offset.total_seconds())), 60)
+    value = f"{sign}{minutes // 60:02d}{minutes % 60:02d}"
+    return value + f"{seconds:02d}" if seconds else value
+
+
+def find_transitions(zone, start, end):
+    """Every change of zone's UTC offset between start and end (aware UTC datetimes), in order."""
+    transitions = []
+    before = start.astimezone(zone)
+    instant = start
+    while instant < end:
+        following = min(instant + SCAN_STEP, end)
+        after = following.astimezone(zone)
+        if after.utcoffset() != before.utcoffset():
+            # The change is somewhere in (instant, following]: bisect to the second
+            low, high = instant, following
+            while high - low > timedelta(seconds=1):
+                middle = low + timedelta(seconds=(high - low) // timedelta(seconds=2))
+                if middle.astimezone(zone).utcoffset() == before.utcoffset():
+                    low = middle
+                else:
+                    high = middle
+            changed = high.astimezone(zone)
+            offset_from, offset_to = before.utcoffset(), changed.utcoffset()
+            transitions.append(Transition((high + offset_from).replace(tzinfo=None), high, offset_from, offset_to,
+                                          changed.tzname(), bool(changed.dst())))
+        before = after
+        instant = following
+    return transitions
+
+
+class CalendarZone:
+    """A zone's offsets over one calendar period, with its VTIMEZONE; built once by calendar_zone."""
+
+    def __init__(self, name, start_date, end_date):
+        self.tzid = name
+        self.zone = get_zone(name)
+        start = (start_date - timedelta(days=LOOKBACK_DAYS)).replace(tzinfo=timezone.utc)
+        end = (end_date + timedelta(days=2)).replace(tzinfo=timezone.utc)
+        period_start = start_date.replace(tzinfo=timezone.utc)
+        transitions = find_transitions(self.zone, start, end)
+        # Keep the last change before the period (it began the offset in effect at its start) and those in it
+        earlier = [transition for transition in transitions if transition.utc <= period_start]
+        self.transitions = tuple(earlier[-1:] + [transition for transition in transitions if transition.utc > period_start])
+        self.initial = start.astimezone(self.zone)
+        self.local_starts = [transition.local_start for transition in self.transitions]
+        self.vtimezone = self.render().encode('utf-8')
+        self.utc_cache = {}
+
+    def offset_at(self, local):
+        """UTC offset for a naive wall-clock time in this zone (the earlier one when a time repeats)."""
+        position = bisect.bisect_right(self.local_starts, local)
+        if position == 0:
+            return self.transitions[0].offset_from if self.transitions else self.initial.utcoffset()
+        return self.transitions[position - 1].offset_to
+
+    def to_utc(self, local):
+        """A naive wall-clock time in this zone as naive UTC; memoized, as every RRULE shares its UNTIL."""
+        utc = self.utc_cache.get(local)
+        if utc is None:
+            utc = self.utc_cache[local] = local - self.offset_at(local)
+        return utc
+
+    def render(self):
+        lines = ['BEGIN:VTIMEZONE', f'TZID:{self.tzid}']
+        if not self.transitions:
+            # A fixed offset over the whole period (no DST, or none nearby)
+            offset = format_offset(self.initial.utcoffset())
+            kind = 'DAYLIGHT' if self.initial.dst() else 'STANDARD'
+            lines += [f'BEGIN:{kind}', 'DTSTART:19700101T000000', f'TZOFFSETFROM:{offset}', f'TZOFFSETTO:{offset}',
+                      f'TZNAME:{self.initial.tzname()}', f'END:{kind}']
+        for transition in self.transitions:
+            kind = 'DAYLIGHT' if transition.dst else 'STANDARD'
+            lines += [f'BEGIN:{kind}', f"DTSTART:{transition.local_start:%Y%m%dT%H%M%S}",
+                      f'TZOFFSETFROM:{format_offset(transition.offset_from)}',
+                      f'TZOFFSETTO:{format_offset(transition.offset_to)}', f'TZNAME:{transition.name}', f'END:{kind}']
+        lines.append('END:VTIMEZONE')
+        return ''.join(line + '\r\n' for line in lines)
+
+
+@functools.lru_cache(maxsize=256)
+def calendar_zone(name, start_date, end_date):
+    """The CalendarZone for zone name over a period (naive midnights); shared by every calendar using it."""
+    return CalendarZone(name, start_date, end_date)
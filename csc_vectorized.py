@@ -0,0 +1,123 @@
+"""NumPy slot placement for large chore catalogs.
+
+VectorSlotAllocator places a whole frequency group in one batched step and
+produces exactly the start times SlotAllocator would produce one chore at a
+time. numpy is optional: when it is missing, AVAILABLE is False and the
+engine stays on the scalar path.
+
+Why a batch works: a day's slots are always taken in order, so the free
+slots after the earlier groups form one sequence ordered by (day, slot).
+Within a group the target days never decrease, so chore j lands on free slot
+
+    p[j] = max(lb[j], p[j - 1] + 1)
+
+where lb[j] is the first free slot on or after its target day. Writing
+q[j] = p[j] - j turns that into a running maximum of lb[j] - j.
+"""
+try:
+    import numpy as np
+    AVAILABLE = True
+except ImportError:
+    np = None
+    AVAILABLE = False
+
+# date(1970, 1, 1).toordinal(): datetime64 days count from there
+EPOCH_ORDINAL = 719163
+
+
+class VectorSlotAllocator:
+    """Batched drop-in for csc_engine.SlotAllocator.place_group."""
+
+    def __init__(self, available_days, first_slot, stagger_minutes, active_end, duration):
+        self.first_ordinal = available_days.first_ordinal
+        self.first_slot = first_slot
+        self.stagger_minutes = stagger_minutes
+        self.period_days = available_days.size
+        self.day_count = len(available_days)
+        # The week's pattern of available days (see csc_engine.DayIndex)
+        self.week_offsets = np.asarray(available_days.week_offsets, dtype=np.int64)
+        self.before = np.asarray(available_days.before, dtype=np.int64)
+        # As for SlotAllocator: the last slot is the last one a chore still ends by active_end
+        latest_start = active_end - duration
+        if latest_start < first_slot:
+            self.capacity = 0
+        elif stagger_minutes > 0:
+            self.capacity = (latest_start - first_slot) // stagger_minutes + 1
+        else:
+            self.capacity = None
+        # Slots taken per day, for the first len(used) days only: grown as chores reach further,
+        # so a long horizon costs memory for the days chores land on, not for the whole period
+        self.used = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, size):
+        """Cover at least the first size days (at least doubling, at most the whole period)."""
+        size = min(max(size, 2 * len(self.used)), self.day_count)
+        if size > len(self.used):
+            self.used = np.concatenate([self.used, np.zeros(size - len(self.used), dtype=np.int64)])
+
+    def target_positions(self, target_ordinals):
+        offsets = np.maximum(np.asarray(target_ordinals, dtype=np.int64) - self.first_ordinal, 0)
+        positions = (offsets // 7) * len(self.week_offsets) + self.before[offsets % 7]
+        return np.where(offsets < self.period_days, positions, self.day_count)
+
+    def day_starts(self, positions):
+        """Midnight of the available days at positions, as datetime64[m]."""
+        per_week = len(self.week_offsets)
+        ordinals = self.first_ordinal + (positions // per_week) * 7 + self.week_offsets[positions % per_week]
+        return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[m]')
+
+    def place_positions(self, positions):
+        """Place chores targeting the given day positions (non-decreasing); return (day positions, slots, placed)."""
+        count = len(positions)
+        in_period = positions < self.day_count
+        if not in_period.any() or self.capacity == 0:
+            return np.zeros(count, dtype=np.int64), np.zeros(count, dtype=np.int64), np.zeros(count, dtype=bool)
+        last_target = int(positions[in_period][-1])
+        if self.capacity is None:
+            # Days never fill up: every chore shares its target day's first slot
+            self._grow(last_target + 1)
+            slots = np.zeros(count, dtype=np.int64)
+            day_positions = np.where(in_period, positions, 0)
+            np.add.at(self.used, day_positions[in_period], 1)
+            return day_positions, slots, in_period
+
+        # Room for the chores to spill past the last target day, if every day after it were empty
+        self._grow(last_target + 1 + count // self.capacity + 1)
+        while True:
+            window = len(self.used)
+            free = self.capacity - self.used
+            free_end = np.cumsum(free)
+            free_start = free_end - free
+            total_free = int(free_end[-1])
+            # First free slot on or after each target day
+            lower = np.where(in_period, free_start[np.minimum(positions, window - 1)], total_free)
+            order = np.arange(count, dtype=np.int64)
+            free_index = np.maximum.accumulate(lower - order) + order
+            placed = free_index < total_free
+            if window == self.day_count or placed[in_period].all():
+                break
+            # Some chores ran out of room inside the window, but the period goes on
+            self._grow(2 * window)
+        day_positions = np.searchsorted(free_end, free_index, side='right')
+        day_positions = np.where(placed, day_positions, 0)
+        slots = np.where(placed, self.used[day_positions] + free_index - free_start[day_positions], 0)
+        self.used += np.bincount(day_positions[placed], minlength=window)
+        return day_positions, slots, placed
+
+    def place_group(self, start_date, count, per, day_offsets):
+        """Place count chores where chore i targets start_date + day_offsets[i // per] days.
+
+        Returns a list of start datetimes, None for chores with no free slot
+        left in the period.
+        """
+        if count == 0:
+            return []
+        targets = start_date.toordinal() + np.asarray(day_offsets, dtype=np.int64)[np.arange(count) // per]
+        day_positions, slots, placed = self.place_positions(self.target_positions(targets))
+        minutes = self.first_slot + slots * self.stagger_minutes
+        starts = self.day_starts(day_positions) + minutes.astype('timedelta64[m]')
+        starts = np.where(placed, starts, np.datetime64('NaT'))
+        return starts.astype('datetime64[us]').tolist()
+
+    def place(self, day):
+        return self.place_group(day, 1, 1, [0])[0]
@@ -0,0 +1,239 @@
+"""Watch chore CSVs and settings and regenerate calendars as they change.
+
+The watcher polls with stat (one os.scandir per watched directory per
+round), which stays cheap for hundreds of households and needs no platform
+file-change API. A household is regenerated once its files have stopped
+changing for the debounce time, so an editor's burst of writes costs one
+run. Its ICS file is written next to the target and renamed over it.
+
+Regeneration is incremental per frequency group. Groups are placed in
+order (monthly, then weekly, then daily), each in the time the ones before
+it left, so where a group's chores land depends on the settings, the run's
+slot layout (csc_engine.slot_layout: whether chores are packed by Duration,
+and the first slot, which packing clamps by the longest chore) and the rows
+before it: how many there are, and when packing, their durations. A group
+whose rows and all of these are unchanged is copied from the last run's
+rendered bytes instead of being rebuilt: editing a weekly task leaves the
+daily set alone, though adding a weekly task, or changing a packed weekly
+chore's Duration, moves the daily chores that now lose their time.
+"""
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import csc_batch
+import csc_engine
+from csc_ics import ICSWriter, read_previous_events
+from csc_metrics import RunMetrics
+from csc_timezone import utc_now
+
+POLL_INTERVAL_SECONDS = 1.0
+DEBOUNCE_SECONDS = 0.5
+
+# Groups in the order schedule_chores fills slots
+GROUP_ORDER = (csc_engine.MONTHLY, csc_engine.WEEKLY, csc_engine.DAILY)
+
+
+def scan_directory(directory, output_dir):
+    """(BatchJob, fingerprint) for each name.csv in directory, from one os.scandir pass."""
+    stats = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            stat = entry.stat()
+            stats[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    found = []
+    for filename in sorted(stats):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() != '.csv':
+            continue
+        settings_name = name + '.json'
+        settings_file = os.path.join(directory, settings_name) if settings_name in stats else None
+        job = csc_batch.BatchJob(name, os.path.join(directory, filename), settings_file,
+                                 os.path.join(output_dir, name + '.ics'), None)
+        found.append((job, (stats[filename], stats.get(settings_name))))
+    return found
+
+
+def file_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class IncrementalCalendar:
+    """One household's calendar, rebuilt group by group as its inputs change.
+
+    calendar_id is the default for settings without one (households use their name, as in batch).
+    """
+
+    def __init__(self, job, calendar_id=None):
+        self.job = job
+        self.calendar_id = calendar_id
+        # frequency -> (placement key, rendered bytes); see regenerate for the key
+        self.groups = {}
+        self.reminder = b''
+
+    def regenerate(self, today=None):
+        """Rebuild the ICS file; returns the frequencies that had to be rescheduled."""
+        job = self.job
+        metrics = RunMetrics(run=job.name)
+        with metrics.stage('settings_load'):
+            settings = csc_engine.load_settings(job.settings_file) if job.settings_file else dict(csc_engine.DEFAULT_SETTINGS)
+            if self.calendar_id is not None:
+                settings.setdefault('calendar_id', self.calendar_id)
+            compiled = csc_engine.compile_settings(settings, today)
+        with metrics.stage('csv_read') as stage:
+            chores = csc_engine.read_chores(job.csv_file)
+            stage.count = len(chores)
+        if chores.errors:
+            logging.warning(f"Skipped {len(chores.errors)} invalid rows in {job.csv_file}")
+
+        settings_key = (json.dumps(settings, sort_keys=True), compiled.start_date)
+        layout = csc_engine.slot_layout(compiled, chores)
+        # A group is placed from its rows, the layout, and how much time the groups before it took:
+        # their chore counts, and when packing, their durations too
+        counts = []
+        earlier = ()
+        keys = {}
+        for frequency in GROUP_ORDER:
+            group = chores.groups[frequency]
+            counts.append(len(group))
+            keys[frequency] = (settings_key, layout, tuple(counts), earlier, group)
+            if layout.packing:
+                earlier += tuple(chore.duration for chore in group)
+        if compiled.members or any(chore.assignee for chore in chores):
+            # Members are balanced across all groups at once, so any change can move any chore
+            stale = list(GROUP_ORDER)
+        else:
+            stale = [frequency for frequency in GROUP_ORDER
+                     if frequency not in self.groups or self.groups[frequency][0] != keys[frequency]]
+
+        # Only the stale groups' events are built; the re-import reminder always is
+        events = {frequency: [] for frequency in GROUP_ORDER}
+        reminder = []
+        reminder_uid = csc_engine.chore_uid(compiled.calendar_id, 'reimport')
+        for scheduled in csc_engine.schedule_chores(chores, compiled, metrics=metrics, frequencies=stale):
+            (reminder if scheduled.uid == reminder_uid else events[scheduled.frequency]).append(scheduled)
+
+        dtstamp = utc_now()
+        zone = compiled.zone
+        with metrics.stage('serialization') as stage:
+            for frequency in stale:
+                old = self.groups.get(frequency)
+                data = render_events(events[frequency], old[1] if old else None, dtstamp, zone)
+                self.groups[frequency] = (keys[frequency], data)
+                stage.count += len(events[frequency])
+            self.reminder = render_events(reminder, self.reminder, dtstamp, zone)
+
+        temp_file = job.output_file + '.tmp'
+        with metrics.stage('file_write') as stage:
+            with open(temp_file, 'wb') as f:
+                writer = ICSWriter(f, zone)
+                writer.write_header()
+                for frequency in GROUP_ORDER:
+                    writer.write_block(self.groups[frequency][1])
+                writer.write_block(self.reminder)
+                writer.write_footer()
+            os.replace(temp_file, job.output_file)
+            stage.count = writer.bytes_written
+        metrics.log()
+        return stale
+
+
+def render_events(events, previous, dtstamp, zone=None):
+    """VEVENT blocks for events as bytes; events unchanged from previous (rendered bytes) keep their DTSTAMP and bytes."""
+    writer = ICSWriter(None, zone)
+    previous = read_previous_events(io.BytesIO(previous)) if previous else {}
+    blocks = []
+    for scheduled in events:
+        old = previous.get(scheduled.uid)
+        if old is not None:
+            block = writer.render_event(scheduled, scheduled.uid, old[0])
+            if block == old[1]:
+                blocks.append(block)
+                continue
+        blocks.append(writer.render_event(scheduled, scheduled.uid, dtstamp))
+    return b''.join(blocks)
+
+
+class Watcher:
+    """Poll a household directory, or one CSV and settings file, and regenerate what changed.
+
+    source is a directory of name.csv files (with optional name.json
+    settings, as for batch), or a single CSV, in which case settings_file
+    and output_file say where its settings are and where the ICS goes.
+    """
+
+    def __init__(self, source, output_dir='.', settings_file=csc_engine.SETTINGS_FILE, output_file=None,
+                 debounce=DEBOUNCE_SECONDS, today=None):
+        self.source = source
+        self.output_dir = output_dir
+        self.settings_file = settings_file
+        self.output_file = output_file
+        self.debounce = debounce
+        self.today = today
+        self.calendars = {}  # name -> IncrementalCalendar
+        self.built = {}  # name -> fingerprint of the files its calendar was last built from
+        self.seen = {}  # name -> (fingerprint, monotonic time it was first seen) for changes not yet built
+
+    def scan(self):
+        if os.path.isdir(self.source):
+            return scan_directory(self.source, self.output_dir)
+        name = os.path.splitext(os.path.basename(self.source))[0]
+        job = csc_batch.BatchJob(name, self.source, self.settings_file,
+                                 self.output_file or os.path.join(self.output_dir, name + '.ics'), None)
+        return [(job, (file_fingerprint(self.source), file_fingerprint(self.settings_file)))]
+
+    def poll(self):
+        """One round: regenerate each household whose files changed and have been quiet for debounce seconds.
+
+        Returns a list of (name, rescheduled frequencies or the error message).
+        """
+        now = time.monotonic()
+        results = []
+        directory = os.path.isdir(self.source)
+        # Periods start today, so a new day is a change too
+        day = (self.today or datetime.now()).date()
+        for job, files in self.scan():
+            name = job.name
+            fingerprint = files + (day,)
+            if files[0] is None or fingerprint == self.built.get(name):
+                self.seen.pop(name, None)
+                continue
+            seen = self.seen.get(name)
+            if seen is None or seen[0] != fingerprint:
+                # Still being written: wait until it has been quiet for debounce seconds
+                self.seen[name] = (fingerprint, now)
+                if self.debounce > 0:
+                    continue
+            elif now - seen[1] < self.debounce:
+                continue
+            del self.seen[name]
+            # Recorded even on failure, so a broken file is retried only once it changes again
+            self.built[name] = fingerprint
+            calendar = self.calendars.get(name)
+            if calendar is None or calendar.job != job:
+                calendar = self.calendars[name] = IncrementalCalendar(job, name if directory else None)
+            try:
+                results.append((name, calendar.regenerate(self.today)))
+                logging.info(f"Watch: regenerated {job.output_file}")
+            except Exception as e:
+                logging.error(f"Watch: {name} failed: {str(e)}")
+                results.append((name, str(e)))
+        return results
+
+    def run(self, interval=POLL_INTERVAL_SECONDS, report=None):
+        """Poll until interrupted, calling report(name, result) for each regeneration."""
+        try:
+            while True:
+                for name, result in self.poll():
+                    if report is not None:
+                        report(name, result)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,166 @@
+"""CalDAVPublisher against an in-process fake collection (through the connect= hook).
+
+Run from the repository root:
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csc_caldav  # noqa: E402
+import csc_engine  # noqa: E402
+
+COLLECTION = '/cal/smiths/'
+
+
+class FakeResponse:
+    def __init__(self, status, body=b'', headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    def read(self):
+        return self.body
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+
+class FakeCollection:
+    """A CalDAV collection in memory: {path: (ETag, body)}, honouring If-Match and If-None-Match."""
+
+    def __init__(self):
+        self.resources = {}
+        self.requests = []  # (method, path, headers), in arrival order
+        self.lock = threading.Lock()
+        self.version = 0
+
+    def new_etag(self):
+        self.version += 1
+        return f'"{self.version}"'
+
+    def handle(self, method, path, body, headers):
+        with self.lock:
+            self.requests.append((method, path, dict(headers)))
+            current = self.resources.get(path)
+            if method == 'PROPFIND':
+                entries = ''.join(f'<d:response><d:href>{href}</d:href><d:propstat><d:prop><d:getetag>{etag}'
+                                  f'</d:getetag></d:prop></d:propstat></d:response>'
+                                  for href, (etag, _) in self.resources.items())
+                return FakeResponse(207, f'<d:multistatus xmlns:d="DAV:">{entries}</d:multistatus>'.encode('utf-8'))
+            if 'If-Match' in headers and (current is None or current[0] != headers['If-Match']):
+                return FakeResponse(412)
+            if headers.get('If-None-Match') == '*' and current is not None:
+                return FakeResponse(412)
+            if method == 'PUT':
+                etag = self.new_etag()
+                self.resources[path] = (etag, body)
+                return FakeResponse(204 if current else 201, headers={'ETag': etag})
+            if method == 'DELETE':
+                if current is None:
+                    return FakeResponse(404)
+                del self.resources[path]
+                return FakeResponse(204)
+            return FakeResponse(405)
+
+
+class FakeConnection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.response = None
+
+    def request(self, method, path, body=None, headers=None):
+        self.response = self.collection.handle(method, path, body, headers or {})
+
+    def getresponse(self):
+        return self.response
+
+    def close(self):
+        pass
+
+
+def schedule(tasks):
+    chores = [csc_engine.make_chore(csc_engine.WEEKLY, 'Kitchen', task) for task in tasks]
+    settings = dict(csc_engine.DEFAULT_SETTINGS, calendar_id='smiths')
+    return list(csc_engine.schedule_chores(chores, settings, datetime(2025, 3, 3)))
+
+
+class CalDAVPublisherTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.state_file = os.path.join(directory.name, 'state.json')
+        self.collection = FakeCollection()
+        self.events = schedule(['Wipe benches', 'Mop floor', 'Clean oven'])
+
+    def publish(self, events):
+        """Publish events with a fresh publisher; returns (result, the requests it sent)."""
+        sent = len(self.collection.requests)
+        publisher = csc_caldav.CalDAVPublisher('http://dav.example.com' + COLLECTION, state_file=self.state_file,
+                                               connect=lambda scheme, host, port: FakeConnection(self.collection))
+        result = publisher.publish(events)
+        return result, self.collection.requests[sent:]
+
+    def test_first_publish_lists_collection_then_creates(self):
+        result, requests = self.publish(self.events)
+        self.assertEqual(requests[0][:2], ('PROPFIND', COLLECTION))
+        puts = requests[1:]
+        self.assertEqual(len(puts), len(self.events))
+        for method, path, headers in puts:
+            self.assertEqual(method, 'PUT')
+            self.assertEqual(headers.get('If-None-Match'), '*')
+            self.assertNotIn('If-Match', headers)
+        self.assertEqual(sorted(path for _, path, _ in puts),
+                         sorted(f"{COLLECTION}{event.uid}.ics" for event in self.events))
+        self.assertEqual((result.created, result.updated, result.deleted, result.requests),
+                         (len(self.events), 0, 0, len(self.events) + 1))
+
+    def test_unchanged_republish_sends_nothing(self):
+        self.publish(self.events)
+        result, requests = self.publish(self.events)
+        self.assertEqual(requests, [])
+        self.assertEqual((result.unchanged, result.requests), (len(self.events), 0))
+
+    def test_changed_event_is_put_with_if_match(self):
+        self.publish(self.events)
+        path = f"{COLLECTION}{self.events[1].uid}.ics"
+        etag = self.collection.resources[path][0]
+        changed = list(self.events)
+        changed[1] = changed[1]._replace(summary='Kitchen: Mop floor and skirting')
+        result, requests = self.publish(changed)
+        self.assertEqual(requests, [('PUT', path, {'Content-Type': 'text/calendar; charset=utf-8', 'If-Match': etag})])
+        self.assertIn(b'SUMMARY:Kitchen: Mop floor and skirting', self.collection.resources[path][1])
+        self.assertEqual((result.updated, result.unchanged), (1, len(self.events) - 1))
+
+    def test_precondition_failed_put_is_retried_unconditionally(self):
+        self.publish(self.events)
+        path = f"{COLLECTION}{self.events[0].uid}.ics"
+        # Someone edits the event on the server, so the stored ETag no longer matches
+        self.collection.resources[path] = (self.collection.new_etag(), b'edited elsewhere')
+        changed = [self.events[0]._replace(summary='Kitchen: Wipe benches and sink')] + self.events[1:]
+        result, requests = self.publish(changed)
+        self.assertEqual([method for method, _, _ in requests], ['PUT', 'PUT'])
+        self.assertIn('If-Match', requests[0][2])
+        self.assertNotIn('If-Match', requests[1][2])
+        self.assertIn(b'SUMMARY:Kitchen: Wipe benches and sink', self.collection.resources[path][1])
+        self.assertEqual((result.updated, result.requests), (1, 2))
+
+    def test_removed_event_is_deleted(self):
+        self.publish(self.events)
+        path = f"{COLLECTION}{self.events[2].uid}.ics"
+        etag = self.collection.resources[path][0]
+        result, requests = self.publish(self.events[:2] + self.events[3:])
+        self.assertEqual(requests, [('DELETE', path, {'If-Match': etag})])
+        self.assertNotIn(path, self.collection.resources)
+        self.assertEqual((result.deleted, result.unchanged), (1, len(self.events) - 1))
+
+
+if __name__ == '__main__':
+    unittest.main()